@@ -93,6 +93,11 @@ async def start_services():
         await set_commands()
         print("   ✓ Bot commands set successfully.")
 
+        try:
+            await db.ensure_indexes()
+        except Exception as e:
+            logger.error(f"Error ensuring database indexes: {e}", exc_info=True)
+
         restart_message_data = await db.get_restart_message()
         if restart_message_data:
             try:
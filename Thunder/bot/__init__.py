@@ -10,7 +10,8 @@ StreamBot = Client(
     api_hash=Var.API_HASH,
     bot_token=Var.BOT_TOKEN,
     sleep_threshold=Var.SLEEP_THRESHOLD,
-    workers=Var.WORKERS
+    workers=Var.WORKERS,
+    max_concurrent_transmissions=1000
 )
 
 multi_clients = {}
@@ -10,8 +10,8 @@ from pyrogram.types import (InlineKeyboardButton, InlineKeyboardMarkup,
                             LinkPreviewOptions, Message)
 
 from Thunder.bot import StreamBot
-from Thunder.utils.bot_utils import (gen_links, is_admin, log_newusr, notify_own,
-                                     reply_user_err)
+from Thunder.utils.bot_utils import (gen_links, index_file, is_admin, log_newusr,
+                                     notify_own, reply_user_err)
 from Thunder.utils.database import db
 from Thunder.utils.decorators import (check_banned, get_shortener_status,
                                       require_token)
@@ -19,6 +19,7 @@ from Thunder.utils.force_channel import force_channel_check
 from Thunder.utils.handler import handle_flood_wait
 from Thunder.utils.logger import logger
 from Thunder.utils.messages import *
+from Thunder.utils.prefetch import prefetcher
 from Thunder.vars import Var
 
 
@@ -148,6 +149,8 @@ async def channel_receive_handler(bot: Client, msg: Message):
             return
         shortener_val = await get_shortener_status(bot, msg)
         links = await gen_links(stored_msg, shortener=shortener_val)
+        await index_file(stored_msg)
+        prefetcher.warm_up(stored_msg)
         source_info = msg.chat.title or "Unknown Channel"
         await handle_flood_wait(
             stored_msg.reply_text,
@@ -180,6 +183,8 @@ async def process_single(bot: Client, msg: Message, file_msg: Message, status_ms
             logger.error(f"Failed to forward media for message {file_msg.id}. Skipping.")
             return None
         links = await gen_links(stored_msg, shortener=shortener_val)
+        await index_file(stored_msg)
+        prefetcher.warm_up(stored_msg)
         if not original_request_msg:
             await send_link(msg, links)
         if msg.chat.type != enums.ChatType.PRIVATE and msg.from_user:
@@ -1,9 +1,24 @@
 # Thunder/server/__init__.py
 
+import asyncio
+from contextlib import suppress
+
 from aiohttp import web
 from .stream_routes import routes
+from Thunder.utils.metrics import metrics_middleware, monitor_loop_lag, record_ttfb
+
+async def start_loop_monitor(app):
+    app['loop_monitor'] = asyncio.create_task(monitor_loop_lag())
+
+async def stop_loop_monitor(app):
+    app['loop_monitor'].cancel()
+    with suppress(asyncio.CancelledError):
+        await app['loop_monitor']
 
 async def web_server():
-    web_app = web.Application(client_max_size=30000000)
+    web_app = web.Application(client_max_size=30000000, middlewares=[metrics_middleware])
     web_app.add_routes(routes)
+    web_app.on_response_prepare.append(record_ttfb)
+    web_app.on_startup.append(start_loop_monitor)
+    web_app.on_cleanup.append(stop_loop_monitor)
     return web_app
@@ -0,0 +1,134 @@
+# Thunder/server/admission.py
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from Thunder.bot import work_loads
+from Thunder.server.exceptions import ServerBusy
+from Thunder.utils.load_balancer import MAX_CONCURRENT_PER_CLIENT, load_balancer
+from Thunder.utils.logger import logger
+from Thunder.vars import Var
+
+EWMA_ALPHA = 0.2
+
+
+class AdmissionController:
+    __slots__ = ('max_per_client', 'queue_size', 'timeout', 'active', '_waiters',
+                 'admitted', 'queued', 'rejected', 'timed_out', 'max_queue_depth',
+                 'avg_wait', 'max_wait')
+
+    def __init__(self, max_per_client: int, queue_size: int, timeout: float) -> None:
+        self.max_per_client = max(1, max_per_client)
+        self.queue_size = max(0, queue_size)
+        self.timeout = max(0.0, timeout)
+        self.active: Dict[int, int] = {}
+        self._waiters: Deque[Tuple[asyncio.Future, float]] = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_queue_depth = 0
+        self.avg_wait = 0.0
+        self.max_wait = 0.0
+
+    def _free_client(self) -> Optional[int]:
+        for client_id in load_balancer.rank(self.max_per_client):
+            if self.active.get(client_id, 0) < self.max_per_client:
+                return client_id
+        return None
+
+    def _admit(self, client_id: int) -> int:
+        self.active[client_id] = self.active.get(client_id, 0) + 1
+        self.admitted += 1
+        return client_id
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.avg_wait or self.timeout))
+
+    async def acquire(self) -> int:
+        if not work_loads:
+            raise ServerBusy("No clients available", retry_after=self.retry_after())
+
+        if not self._waiters:
+            client_id = self._free_client()
+            if client_id is not None:
+                return self._admit(client_id)
+
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            logger.debug(f"Admission queue full ({len(self._waiters)}), rejecting stream")
+            raise ServerBusy("Admission queue is full", retry_after=self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        started = time.monotonic()
+        waiter = (future, started)
+        self._waiters.append(waiter)
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        try:
+            client_id = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self.timed_out += 1
+            logger.debug(f"Stream waited {self.timeout}s for admission, rejecting")
+            raise ServerBusy("Timed out waiting for a free client", retry_after=self.retry_after())
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+        waited = time.monotonic() - started
+        self.avg_wait += EWMA_ALPHA * (waited - self.avg_wait)
+        self.max_wait = max(self.max_wait, waited)
+        return client_id
+
+    def _abandon(self, waiter: Tuple[asyncio.Future, float]) -> None:
+        future, _ = waiter
+        if future.done() and not future.cancelled():
+            self.release(future.result())
+            return
+        future.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, client_id: int) -> None:
+        if self.active.get(client_id, 0) > 0:
+            self.active[client_id] -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters:
+            future, _ = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            client_id = self._free_client()
+            if client_id is None:
+                return
+            self._waiters.popleft()
+            future.set_result(self._admit(client_id))
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        waiting = [now - started for future, started in self._waiters if not future.done()]
+        return {
+            "max_per_client": self.max_per_client,
+            "active": {str(k): v for k, v in sorted(self.active.items())},
+            "queue_depth": len(waiting),
+            "queue_limit": self.queue_size,
+            "max_queue_depth": self.max_queue_depth,
+            "oldest_wait": round(max(waiting, default=0.0), 3),
+            "avg_wait": round(self.avg_wait, 3),
+            "max_wait": round(self.max_wait, 3),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out
+        }
+
+
+admission = AdmissionController(MAX_CONCURRENT_PER_CLIENT, Var.ADMISSION_QUEUE_SIZE, Var.ADMISSION_TIMEOUT)
@@ -5,3 +5,8 @@ class InvalidHash(Exception):
 
 class FileNotFound(Exception):
     pass
+
+class ServerBusy(Exception):
+    def __init__(self, message: str = "", retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
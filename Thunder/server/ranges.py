@@ -0,0 +1,78 @@
+# Thunder/server/ranges.py
+
+import re
+import secrets
+from typing import List, Optional, Tuple
+
+from aiohttp import web
+
+MAX_RANGES = 16
+RANGE_SPEC_REGEX = re.compile(r"^(\d*)-(\d*)$")
+
+ByteRange = Tuple[int, int]
+Segment = Tuple[bytes, int, int]
+
+
+def parse_range_header(range_header: str, file_size: int) -> Optional[List[ByteRange]]:
+    unit, _, specs = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs.strip():
+        return None
+
+    ranges = []
+    for spec in specs.split(","):
+        spec = spec.strip()
+        if not spec:
+            continue
+        match = RANGE_SPEC_REGEX.match(spec)
+        if not match or not any(match.groups()):
+            return None
+        first, last = match.groups()
+
+        if not first:
+            suffix = int(last)
+            if suffix > 0:
+                ranges.append((max(0, file_size - suffix), file_size - 1))
+            continue
+
+        start = int(first)
+        end = int(last) if last else file_size - 1
+        if last and end < start:
+            return None
+        if start < file_size:
+            ranges.append((start, min(end, file_size - 1)))
+
+    if not ranges:
+        raise web.HTTPRequestRangeNotSatisfiable(headers={"Content-Range": f"bytes */{file_size}"})
+
+    ranges = coalesce_ranges(ranges)
+    if len(ranges) > MAX_RANGES:
+        return None
+    return ranges
+
+
+def coalesce_ranges(ranges: List[ByteRange]) -> List[ByteRange]:
+    merged: List[ByteRange] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def build_multipart(ranges: List[ByteRange], file_size: int, mime_type: str) -> Tuple[str, List[Segment], bytes]:
+    boundary = secrets.token_hex(16)
+    segments = []
+    for i, (start, end) in enumerate(ranges):
+        prefix = (b"\r\n" if i else b"") + (
+            f"--{boundary}\r\n"
+            f"Content-Type: {mime_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n"
+        ).encode()
+        segments.append((prefix, start, end))
+    trailer = f"\r\n--{boundary}--\r\n".encode()
+    return boundary, segments, trailer
+
+
+def segments_length(segments: List[Segment], trailer: bytes = b"") -> int:
+    return sum(len(prefix) + end - start + 1 for prefix, start, end in segments) + len(trailer)
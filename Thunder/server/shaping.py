@@ -0,0 +1,175 @@
+# Thunder/server/shaping.py
+
+import asyncio
+import math
+import time
+from typing import Dict, Hashable, Optional
+
+from aiohttp import web
+
+from Thunder.server.exceptions import ServerBusy
+from Thunder.utils.logger import logger
+from Thunder.vars import Var
+
+MIN_BURST = 256 * 1024
+
+
+def get_client_ip(request: web.Request) -> str:
+    hops = Var.TRUSTED_PROXY_HOPS
+    if hops > 0:
+        forwarded = [ip.strip() for ip in request.headers.get("X-Forwarded-For", "").split(",") if ip.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.remote or "unknown"
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self.burst = max(rate, MIN_BURST)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: int) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class ShareGroup:
+    __slots__ = ('semaphore', 'bucket', 'users', 'waiting')
+
+    def __init__(self, max_streams: int, rate: int) -> None:
+        self.semaphore = asyncio.Semaphore(max_streams) if max_streams > 0 else None
+        self.bucket = TokenBucket(rate) if rate > 0 else None
+        self.users = 0
+        self.waiting = 0
+
+
+class Shaper:
+    __slots__ = ('max_streams', 'rate', 'queue_size', 'timeout', '_groups', 'streams', 'queued',
+                 'rejected', 'timed_out', 'throttled', 'throttled_seconds')
+
+    def __init__(self, max_streams: int, rate_kb: int, queue_size: int, timeout: float) -> None:
+        self.max_streams = max(0, max_streams)
+        self.rate = max(0, rate_kb) * 1024
+        self.queue_size = max(0, queue_size)
+        self.timeout = max(0.0, timeout)
+        self._groups: Dict[Hashable, ShareGroup] = {}
+        self.streams = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_streams > 0 or self.rate > 0
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.timeout))
+
+    async def acquire(self, key: Hashable) -> Optional[ShareGroup]:
+        if not self.enabled:
+            return None
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = ShareGroup(self.max_streams, self.rate)
+        group.users += 1
+        if group.semaphore is not None:
+            if group.semaphore.locked():
+                if group.waiting >= self.queue_size:
+                    self._forget(key, group)
+                    self.rejected += 1
+                    logger.debug(f"Stream queue full for {key} ({group.waiting}), rejecting stream")
+                    raise ServerBusy("Too many streams waiting for this share", retry_after=self.retry_after())
+                self.queued += 1
+            group.waiting += 1
+            try:
+                await asyncio.wait_for(group.semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self._forget(key, group)
+                self.timed_out += 1
+                logger.debug(f"Stream waited {self.timeout}s for a slot on {key}, rejecting")
+                raise ServerBusy("Timed out waiting for a stream slot", retry_after=self.retry_after())
+            except BaseException:
+                self._forget(key, group)
+                raise
+            finally:
+                group.waiting -= 1
+        self.streams += 1
+        return group
+
+    def release(self, key: Hashable, group: Optional[ShareGroup]) -> None:
+        if group is None:
+            return
+        self.streams -= 1
+        if group.semaphore is not None:
+            group.semaphore.release()
+        self._forget(key, group)
+
+    def _forget(self, key: Hashable, group: ShareGroup) -> None:
+        group.users -= 1
+        if group.users <= 0 and self._groups.get(key) is group:
+            del self._groups[key]
+
+    async def throttle(self, group: Optional[ShareGroup], nbytes: int) -> None:
+        if group is None or group.bucket is None:
+            return
+        delay = group.bucket.reserve(nbytes)
+        if delay > 0:
+            self.throttled += 1
+            self.throttled_seconds += delay
+            await asyncio.sleep(delay)
+
+    def snapshot(self) -> dict:
+        return {
+            "max_streams": self.max_streams,
+            "rate_limit": self.rate,
+            "tracked": len(self._groups),
+            "streams": self.streams,
+            "waiting": sum(g.users for g in self._groups.values()) - self.streams,
+            "queue_limit": self.queue_size,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "throttled": self.throttled,
+            "throttled_seconds": round(self.throttled_seconds, 3)
+        }
+
+
+class FairShareLease:
+    __slots__ = ('ip', 'link', 'ip_group', 'link_group')
+
+    def __init__(self, ip: str, link: Hashable) -> None:
+        self.ip = ip
+        self.link = link
+        self.ip_group: Optional[ShareGroup] = None
+        self.link_group: Optional[ShareGroup] = None
+
+    async def acquire(self) -> "FairShareLease":
+        self.ip_group = await ip_shaper.acquire(self.ip)
+        try:
+            self.link_group = await link_shaper.acquire(self.link)
+        except BaseException:
+            self.release()
+            raise
+        return self
+
+    async def throttle(self, nbytes: int) -> None:
+        await ip_shaper.throttle(self.ip_group, nbytes)
+        await link_shaper.throttle(self.link_group, nbytes)
+
+    def release(self) -> None:
+        ip_shaper.release(self.ip, self.ip_group)
+        link_shaper.release(self.link, self.link_group)
+        self.ip_group = self.link_group = None
+
+
+ip_shaper = Shaper(Var.MAX_STREAMS_PER_IP, Var.RATE_LIMIT_PER_IP, Var.SHAPING_QUEUE_SIZE, Var.SHAPING_TIMEOUT)
+link_shaper = Shaper(Var.MAX_STREAMS_PER_LINK, Var.RATE_LIMIT_PER_LINK, Var.SHAPING_QUEUE_SIZE, Var.SHAPING_TIMEOUT)
@@ -3,35 +3,44 @@
 import re
 import secrets
 import time
-from urllib.parse import quote, unquote
+from contextlib import aclosing
+from email.utils import formatdate
+from urllib.parse import quote, unquote, urljoin
 
 from aiohttp import web
+from aiohttp.helpers import ETAG_ANY
 
 from Thunder import __version__, StartTime
 from Thunder.bot import StreamBot, multi_clients, work_loads
-from Thunder.server.exceptions import FileNotFound, InvalidHash
-from Thunder.utils.custom_dl import ByteStreamer
+from Thunder.server.admission import admission
+from Thunder.server.exceptions import FileNotFound, InvalidHash, ServerBusy
+from Thunder.server.ranges import (build_multipart, parse_range_header,
+                                   segments_length)
+from Thunder.server.shaping import (FairShareLease, get_client_ip, ip_shaper,
+                                    link_shaper)
+from Thunder.server.timing import RequestTimer
+from Thunder.server.writer import ActiveStream, active_streams, tune_transport
+from Thunder.utils.custom_dl import (ByteStreamer, chunk_cache, disk_cache,
+                                     file_info_cache, get_streamer, plan_range)
+from Thunder.utils.load_balancer import MAX_CONCURRENT_PER_CLIENT, load_balancer
 from Thunder.utils.logger import logger
-from Thunder.utils.render_template import render_page
+from Thunder.utils import metrics
+from Thunder.utils.mp4 import (build_hls_playlist, cached_mp4_index,
+                               get_mp4_index, mp4_indexes)
+from Thunder.utils.prefetch import prefetcher
+from Thunder.utils.render_template import get_rendered_page, page_cache
+from Thunder.utils.thumbnails import get_thumbnail, thumb_cache, thumb_mime_type
 from Thunder.utils.time_format import get_readable_time
+from Thunder.vars import Var
 
 routes = web.RouteTableDef()
 
 SECURE_HASH_LENGTH = 6
 CHUNK_SIZE = 1024 * 1024
-MAX_CONCURRENT_PER_CLIENT = 8
-RANGE_REGEX = re.compile(r"bytes=(?P<start>\d*)-(?P<end>\d*)")
 PATTERN_HASH_FIRST = re.compile(rf"^([a-zA-Z0-9_-]{{{SECURE_HASH_LENGTH}}})(\d+)(?:/.*)?$")
 PATTERN_ID_FIRST = re.compile(r"^(\d+)(?:/.*)?$")
 VALID_HASH_REGEX = re.compile(r'^[a-zA-Z0-9_-]+$')
 
-streamers = {}
-
-def get_streamer(client_id: int) -> ByteStreamer:
-    if client_id not in streamers:
-        streamers[client_id] = ByteStreamer(multi_clients[client_id])
-    return streamers[client_id]
-
 def parse_media_request(path: str, query: dict) -> tuple[int, str]:
     clean_path = unquote(path).strip('/')
     
@@ -59,36 +68,60 @@ def parse_media_request(path: str, query: dict) -> tuple[int, str]:
     
     raise InvalidHash("Invalid URL structure or missing hash")
 
-def select_optimal_client() -> tuple[int, ByteStreamer]:
-    if not work_loads:
-        raise web.HTTPInternalServerError(text="No available clients to handle the request. Please try again later.")
-    
-    available_clients = [(cid, load) for cid, load in work_loads.items() if load < MAX_CONCURRENT_PER_CLIENT]
+def select_stripe_clients(primary_id: int, content_length: int) -> list[tuple[int, ByteStreamer]]:
+    if Var.STRIPE_CLIENTS <= 1 or content_length < Var.STRIPE_MIN_SIZE * CHUNK_SIZE:
+        return []
     
-    if available_clients:
-        client_id = min(available_clients, key=lambda x: x[1])[0]
-    else:
-        client_id = min(work_loads, key=work_loads.get)
-    
-    return client_id, get_streamer(client_id)
+    candidates = [
+        cid for cid in load_balancer.rank(MAX_CONCURRENT_PER_CLIENT, exclude=(primary_id,))
+        if work_loads[cid] < MAX_CONCURRENT_PER_CLIENT and not load_balancer.is_throttled(cid)
+    ]
+    return [(cid, get_streamer(cid)) for cid in candidates[:Var.STRIPE_CLIENTS - 1]]
 
-def parse_range_header(range_header: str, file_size: int) -> tuple[int, int]:
-    if not range_header:
-        return 0, file_size - 1
-    
-    match = RANGE_REGEX.match(range_header)
-    if not match:
-        raise web.HTTPBadRequest(text=f"Invalid range header: {range_header}")
-    
-    start = int(match.group("start")) if match.group("start") else 0
-    end = int(match.group("end")) if match.group("end") else file_size - 1
+def accepted_encodings(request: web.Request) -> set[str]:
+    encodings = set()
+    for item in request.headers.get("Accept-Encoding", "").lower().split(","):
+        name, _, params = item.partition(";")
+        params = params.replace(" ", "")
+        try:
+            weight = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            weight = 0.0
+        if name.strip() and weight > 0:
+            encodings.add(name.strip())
+    return encodings
+
+def select_metadata_streamer() -> ByteStreamer:
+    client_id = load_balancer.select(MAX_CONCURRENT_PER_CLIENT)
+    if client_id is None:
+        raise ServerBusy("No clients available")
+    return get_streamer(client_id)
+
+def get_validators(file_info: dict) -> dict:
+    validators = {"ETag": f'"{file_info["unique_id"]}"'}
+    if file_info.get('date'):
+        validators["Last-Modified"] = formatdate(file_info['date'], usegmt=True)
+    return validators
+
+def is_not_modified(request: web.Request, file_info: dict) -> bool:
+    if_none_match = request.if_none_match
+    if if_none_match is not None:
+        return any(tag.value in (ETAG_ANY, file_info['unique_id']) for tag in if_none_match)
     
-    if start < 0 or end >= file_size or start > end:
-        raise web.HTTPRequestRangeNotSatisfiable(
-            headers={"Content-Range": f"bytes */{file_size}"}
-        )
+    if_modified_since = request.if_modified_since
+    if if_modified_since and file_info.get('date'):
+        return int(file_info['date']) <= if_modified_since.timestamp()
+    return False
+
+def range_applies(request: web.Request, file_info: dict) -> bool:
+    if_range = request.headers.get("If-Range", "").strip()
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == f'"{file_info["unique_id"]}"'
     
-    return start, end
+    modified = request.if_range
+    return bool(modified and file_info.get('date') and int(file_info['date']) == int(modified.timestamp()))
 
 @routes.get("/", allow_head=True)
 async def root_redirect(request):
@@ -114,114 +147,373 @@ async def status_endpoint(request):
         "resources": {
             "total_workload": total_load,
             "workload_distribution": workload_distribution
+        },
+        "load_balancer": load_balancer.snapshot(),
+        "admission": admission.snapshot(),
+        "streams": active_streams.snapshot(),
+        "shaping": {
+            "per_ip": ip_shaper.snapshot(),
+            "per_link": link_shaper.snapshot()
+        },
+        "cache": {
+            "file_info_entries": len(file_info_cache),
+            "mp4_indexes": len(mp4_indexes),
+            "mp4_index_bytes": mp4_indexes.size,
+            "chunks": chunk_cache.stats(),
+            "disk": disk_cache.stats(),
+            "prefetch": prefetcher.stats(),
+            "thumbnails": thumb_cache.stats(),
+            "pages": len(page_cache)
         }
     })
 
+@routes.get("/metrics")
+async def metrics_endpoint(request):
+    client_ids = sorted(multi_clients)
+    flood_waits = [((str(cid),), load_balancer.stats(cid).flood_waits) for cid in client_ids]
+    flood_wait_seconds = [((str(cid),), load_balancer.stats(cid).flood_wait_seconds) for cid in client_ids]
+    lines = [
+        *metrics.http_requests.render(),
+        *metrics.http_ttfb.render(),
+        *metrics.stream_duration.render(),
+        *metrics.bytes_served.render(),
+        *metrics.upstream_fetch.render(),
+        *metrics.render_samples("counter", "thunder_flood_waits_total",
+                                "FloodWait errors per client.", ("client_id",), flood_waits),
+        *metrics.render_samples("counter", "thunder_flood_wait_seconds_total",
+                                "Seconds of FloodWait imposed per client.", ("client_id",), flood_wait_seconds),
+        *metrics.render_samples("gauge", "thunder_active_streams",
+                                "Media streams currently being served.", (), [((), len(active_streams))]),
+        *metrics.render_samples("gauge", "thunder_client_workload",
+                                "In-flight work per client.", ("client_id",),
+                                [((str(cid),), work_loads.get(cid, 0)) for cid in client_ids]),
+        *metrics.render_samples("gauge", "thunder_admission_queue_depth",
+                                "Requests waiting for a client slot.", (),
+                                [((), admission.snapshot()["queue_depth"])]),
+        *metrics.render_samples("gauge", "thunder_event_loop_lag_last_seconds",
+                                "Most recent event loop lag sample.", (), [((), metrics.last_loop_lag)]),
+        *metrics.loop_lag.render()
+    ]
+    return web.Response(text="\n".join(lines) + "\n", headers={
+        "Content-Type": "text/plain; version=0.0.4; charset=utf-8",
+        "Cache-Control": "no-store"
+    })
+
 @routes.get(r"/watch/{path:.+}", allow_head=True)
 async def media_preview(request: web.Request):
+    timer = RequestTimer("media_preview")
     try:
         path = request.match_info["path"]
         message_id, secure_hash = parse_media_request(path, request.query)
+        timer.mark("parse")
+        timer.annotate(message_id=message_id)
+        
+        page = await get_rendered_page(message_id, secure_hash, requested_action='stream')
+        timer.mark("page")
         
-        rendered_page = await render_page(message_id, secure_hash, requested_action='stream')
-        return web.Response(text=rendered_page, content_type='text/html')
+        headers = {"Vary": "Accept-Encoding"}
+        encodings = accepted_encodings(request)
+        if page.br is not None and "br" in encodings:
+            body, headers["Content-Encoding"] = page.br, "br"
+        elif "gzip" in encodings:
+            body, headers["Content-Encoding"] = page.gzip, "gzip"
+        else:
+            body = page.html
+        timer.mark("encode")
+        timer.annotate(status=200, bytes=len(body))
+        headers.update(timer.server_timing())
+        return web.Response(body=body, content_type='text/html', charset='utf-8', headers=headers)
         
     except (InvalidHash, FileNotFound) as e:
         logger.debug(f"Client error in preview: {type(e).__name__} - {e}", exc_info=True)
         raise web.HTTPNotFound(text="Resource not found") from e
+    except ServerBusy as e:
+        raise web.HTTPServiceUnavailable(
+            text="Server is busy. Please try again later.",
+            headers={"Retry-After": str(e.retry_after)}
+        ) from e
     except Exception as e:
         error_id = secrets.token_hex(6)
         logger.error(f"Preview error {error_id}: {e}", exc_info=True)
         raise web.HTTPInternalServerError(text=f"Server error occurred: {error_id}") from e
+    finally:
+        timer.finish()
+
+@routes.get(r"/thumb/{path:.+}", allow_head=True)
+async def thumbnail(request: web.Request):
+    try:
+        message_id, secure_hash = parse_media_request(request.match_info["path"], request.query)
+        
+        streamer = select_metadata_streamer()
+        file_info = await streamer.get_file_info(message_id)
+        if not file_info.get('unique_id') or file_info['unique_id'][:SECURE_HASH_LENGTH] != secure_hash:
+            raise InvalidHash("Provided hash does not match file's unique ID.")
+        if 'thumb_id' not in file_info:
+            file_info = await streamer.get_file_properties(message_id, refresh=True)
+        
+        etag = f"{file_info['unique_id']}-thumb"
+        headers = {"ETag": f'"{etag}"', "Cache-Control": "public, max-age=31536000"}
+        if request.if_none_match and any(tag.value in (ETAG_ANY, etag) for tag in request.if_none_match):
+            return web.Response(status=304, headers=headers)
+        
+        data = await get_thumbnail(streamer, file_info)
+        if not data:
+            raise FileNotFound("File has no thumbnail.")
+        
+        return web.Response(body=data, content_type=thumb_mime_type(data), headers=headers)
+        
+    except (InvalidHash, FileNotFound) as e:
+        logger.debug(f"Client error in thumbnail: {type(e).__name__} - {e}", exc_info=True)
+        raise web.HTTPNotFound(text="Resource not found") from e
+    except ServerBusy as e:
+        raise web.HTTPServiceUnavailable(
+            text="Server is busy. Please try again later.",
+            headers={"Retry-After": str(e.retry_after)}
+        ) from e
+    except Exception as e:
+        error_id = secrets.token_hex(6)
+        logger.error(f"Thumbnail error {error_id}: {e}", exc_info=True)
+        raise web.HTTPInternalServerError(text=f"Server error occurred: {error_id}") from e
+
+@routes.get(r"/hls/{path:[^/]+}/index.m3u8", allow_head=True)
+async def hls_playlist(request: web.Request):
+    try:
+        message_id, secure_hash = parse_media_request(request.match_info["path"], request.query)
+        
+        file_info = await select_metadata_streamer().get_file_info(message_id)
+        if not file_info.get('unique_id') or file_info['unique_id'][:SECURE_HASH_LENGTH] != secure_hash:
+            raise InvalidHash("Provided hash does not match file's unique ID.")
+        
+        validators = get_validators(file_info)
+        if is_not_modified(request, file_info):
+            return web.Response(status=304, headers=validators)
+        
+        mp4_index = await get_mp4_index(file_info)
+        filename = quote((file_info.get('file_name') or f"file_{message_id}").replace('/', '_'))
+        playlist = mp4_index and build_hls_playlist(mp4_index, urljoin(Var.URL, f"{secure_hash}{message_id}/{filename}"))
+        if not playlist:
+            raise FileNotFound("File is not a fragmented MP4 with a segment index.")
+        
+        return web.Response(
+            text=playlist,
+            content_type="application/vnd.apple.mpegurl",
+            headers={**validators, "Cache-Control": "public, max-age=31536000"}
+        )
+        
+    except (InvalidHash, FileNotFound) as e:
+        logger.debug(f"Client error in HLS playlist: {type(e).__name__} - {e}", exc_info=True)
+        raise web.HTTPNotFound(text="Resource not found") from e
+    except ServerBusy as e:
+        raise web.HTTPServiceUnavailable(
+            text="Server is busy. Please try again later.",
+            headers={"Retry-After": str(e.retry_after)}
+        ) from e
+    except Exception as e:
+        error_id = secrets.token_hex(6)
+        logger.error(f"HLS playlist error {error_id}: {e}", exc_info=True)
+        raise web.HTTPInternalServerError(text=f"Server error occurred: {error_id}") from e
 
 @routes.get(r"/{path:.+}", allow_head=True)
 async def media_delivery(request: web.Request):
+    timer = RequestTimer("media_delivery")
     try:
         path = request.match_info["path"]
         message_id, secure_hash = parse_media_request(path, request.query)
+        timer.mark("parse")
         
-        client_id, streamer = select_optimal_client()
+        file_info = await select_metadata_streamer().get_file_info(message_id)
+        timer.mark("file_info")
+        timer.annotate(message_id=message_id, dc=getattr(file_info.get('file_id'), 'dc_id', None))
+        if not file_info.get('unique_id'):
+            raise FileNotFound("File unique ID not found in info.")
         
-        work_loads[client_id] += 1
+        if file_info['unique_id'][:SECURE_HASH_LENGTH] != secure_hash:
+            raise InvalidHash("Provided hash does not match file's unique ID.")
         
+        file_size = file_info.get('file_size', 0)
+        if file_size == 0:
+            raise FileNotFound("File size is reported as zero or unavailable.")
+        
+        validators = get_validators(file_info)
+        if is_not_modified(request, file_info):
+            timer.annotate(status=304)
+            return web.Response(
+                status=304,
+                headers={**validators, "Cache-Control": "public, max-age=31536000", **timer.server_timing()}
+            )
+        
+        range_header = request.headers.get("Range", "") if range_applies(request, file_info) else ""
+        ranges = parse_range_header(range_header, file_size) if range_header else None
+        if ranges == [(0, file_size - 1)]:
+            ranges = None
+        
+        unique_id = file_info['unique_id']
+        mime_type = file_info.get('mime_type') or 'application/octet-stream'
+        filename = file_info.get('file_name') or f"file_{secrets.token_hex(4)}"
+        
+        content_type = mime_type
+        trailer = b""
+        if not ranges:
+            segments = [(b"", 0, file_size - 1)]
+        elif len(ranges) == 1:
+            segments = [(b"", *ranges[0])]
+        else:
+            boundary, segments, trailer = build_multipart(ranges, file_size, mime_type)
+            content_type = f"multipart/byteranges; boundary={boundary}"
+        content_length = segments_length(segments, trailer)
+        status = 206 if ranges else 200
+        
+        headers = {
+            "Content-Type": content_type,
+            "Content-Length": str(content_length),
+            "Content-Disposition": f"inline; filename*=UTF-8''{quote(filename)}",
+            "Accept-Ranges": "bytes",
+            "Cache-Control": "public, max-age=31536000",
+            "Connection": "keep-alive",
+            **validators
+        }
+        
+        if ranges and len(ranges) == 1:
+            headers["Content-Range"] = f"bytes {ranges[0][0]}-{ranges[0][1]}/{file_size}"
+        
+        timer.mark("range")
+        timer.annotate(status=status, offset=segments[0][1], length=content_length)
+        
+        if request.method == "HEAD":
+            return web.Response(status=status, headers={**headers, **timer.server_timing()})
+        
+        client_ip = get_client_ip(request)
+        prefetcher.record_view(file_info, client_ip)
+        mp4_index = cached_mp4_index(file_info)
+        
+        lease = await FairShareLease(client_ip, message_id).acquire()
+        client_id = stream = stream_id = None
+        peers = []
         try:
-            file_info = await streamer.get_file_info(message_id)
-            if not file_info.get('unique_id'):
-                raise FileNotFound("File unique ID not found in info.")
-            
-            if file_info['unique_id'][:SECURE_HASH_LENGTH] != secure_hash:
-                raise InvalidHash("Provided hash does not match file's unique ID.")
-            
-            file_size = file_info.get('file_size', 0)
-            if file_size == 0:
-                raise FileNotFound("File size is reported as zero or unavailable.")
-            
-            range_header = request.headers.get("Range", "")
-            start, end = parse_range_header(range_header, file_size)
-            content_length = end - start + 1
+            client_id = await admission.acquire()
+            work_loads[client_id] += 1
+            streamer = get_streamer(client_id)
+            timer.mark("queue")
+            timer.annotate(client_id=client_id)
             
-            if start == 0 and end == file_size - 1:
-                range_header = ""
+            peers = select_stripe_clients(client_id, content_length)
+            for peer_id, _ in peers:
+                work_loads[peer_id] += 1
             
-            mime_type = file_info.get('mime_type') or 'application/octet-stream'
-            filename = file_info.get('file_name') or f"file_{secrets.token_hex(4)}"
+            stream = ActiveStream(request, message_id, client_id, content_length)
+            stream_id = active_streams.register(stream)
             
-            headers = {
-                "Content-Type": mime_type,
-                "Content-Length": str(content_length),
-                "Content-Disposition": f"inline; filename*=UTF-8''{quote(filename)}",
-                "Accept-Ranges": "bytes",
-                "Cache-Control": "public, max-age=31536000",
-                "Connection": "keep-alive"
-            }
+            response = web.StreamResponse(status=status, headers={**headers, **timer.server_timing()})
+            tune_transport(request)
+            await response.prepare(request)
+            timer.mark("headers")
             
-            if range_header:
-                headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+            async def send(data):
+                timer.mark("fetch")
+                await lease.throttle(len(data))
+                timer.mark("throttle")
+                timer.first_byte()
+                metrics.observe_ttfb(request)
+                await stream.write(response, data)
+                timer.mark("socket")
             
-            async def stream_generator():
-                try:
-                    bytes_sent = 0
-                    bytes_to_skip = start % CHUNK_SIZE
+            try:
+                for prefix, start, end in segments:
+                    if prefix:
+                        await send(prefix)
                     
-                    async for chunk in streamer.stream_file(message_id, offset=start, limit=content_length):
-                        if bytes_to_skip > 0:
-                            if len(chunk) <= bytes_to_skip:
-                                bytes_to_skip -= len(chunk)
+                    if mp4_index is not None:
+                        cached = mp4_index.read(start, end + 1)
+                        if cached:
+                            await send(cached)
+                            start += len(cached)
+                            if start > end:
                                 continue
-                            chunk = chunk[bytes_to_skip:]
-                            bytes_to_skip = 0
-                        
-                        remaining = content_length - bytes_sent
-                        if len(chunk) > remaining:
-                            chunk = chunk[:remaining]
-                        
-                        if chunk:
-                            yield chunk
-                            bytes_sent += len(chunk)
-                        
-                        if bytes_sent >= content_length:
-                            break
-                finally:
-                    work_loads[client_id] -= 1
-            return web.Response(
-                status=206 if range_header else 200,
-                body=stream_generator(),
-                headers=headers
-            )
+                    
+                    pieces = plan_range(start, end + 1)
+                    if disk_cache.enabled and all((unique_id, index) in disk_cache for index, _, _ in pieces):
+                        for index, piece_start, piece_end in pieces:
+                            segment_path = await disk_cache.path((unique_id, index))
+                            if segment_path is None:
+                                break
+                            timer.mark("fetch")
+                            await lease.throttle(piece_end - piece_start)
+                            timer.mark("throttle")
+                            timer.first_byte()
+                            metrics.observe_ttfb(request)
+                            try:
+                                await stream.sendfile(response, segment_path, piece_start, piece_end - piece_start)
+                            except FileNotFoundError:
+                                break
+                            timer.mark("sendfile")
+                            start = index * CHUNK_SIZE + piece_end
+                        if start > end:
+                            continue
+                    
+                    segment_length = end - start + 1
+                    bytes_sent = 0
+                    
+                    async with aclosing(streamer.stream_file(
+                        message_id,
+                        offset=start,
+                        limit=segment_length,
+                        peers=[peer for _, peer in peers]
+                    )) as chunks:
+                        async for chunk in chunks:
+                            remaining = segment_length - bytes_sent
+                            if len(chunk) > remaining:
+                                chunk = chunk[:remaining]
+                            
+                            if chunk:
+                                await send(chunk)
+                                bytes_sent += len(chunk)
+                            
+                            if bytes_sent >= segment_length:
+                                break
+                    
+                    if bytes_sent < segment_length:
+                        raise ConnectionError(f"Stream for message {message_id} ended early at byte {start + bytes_sent}")
+                
+                if trailer:
+                    await send(trailer)
+                await response.write_eof()
+                
+            except ConnectionResetError:
+                timer.annotate(error="client_disconnected")
+                logger.debug(f"Client disconnected from message {message_id} after {stream.bytes_sent} bytes")
+            except Exception as e:
+                error_id = secrets.token_hex(6)
+                timer.annotate(error=error_id)
+                logger.error(f"Stream error {error_id}: {e}", exc_info=True)
+                if request.transport is not None:
+                    request.transport.close()
+            return response
             
-        except (FileNotFound, InvalidHash):
-            work_loads[client_id] -= 1
-            raise
-        except Exception as e:
-            work_loads[client_id] -= 1
-            error_id = secrets.token_hex(6)
-            logger.error(f"Stream error {error_id}: {e}", exc_info=True) # Ensure exc_info is true
-            raise web.HTTPInternalServerError(text=f"Server error during streaming: {error_id}") from e
+        finally:
+            if stream is not None:
+                timer.annotate(bytes=stream.bytes_sent)
+                active_streams.unregister(stream_id)
+            for peer_id, _ in peers:
+                work_loads[peer_id] -= 1
+            if client_id is not None:
+                work_loads[client_id] -= 1
+                admission.release(client_id)
+            lease.release()
         
+    except web.HTTPException:
+        raise
     except (InvalidHash, FileNotFound) as e:
         logger.debug(f"Client error: {type(e).__name__} - {e}", exc_info=True)
         raise web.HTTPNotFound(text="Resource not found") from e
+    except ServerBusy as e:
+        logger.debug(f"Rejecting stream: {e}")
+        raise web.HTTPServiceUnavailable(
+            text="Server is busy. Please try again later.",
+            headers={"Retry-After": str(e.retry_after)}
+        ) from e
     except Exception as e:
         error_id = secrets.token_hex(6)
         logger.error(f"Server error {error_id}: {e}", exc_info=True)
         raise web.HTTPInternalServerError(text=f"An unexpected server error occurred: {error_id}") from e
+    finally:
+        timer.finish()
@@ -0,0 +1,61 @@
+# Thunder/server/timing.py
+
+import json
+import random
+import time
+from typing import Any, Dict, Optional
+
+from Thunder.utils.logger import logger
+from Thunder.vars import Var
+
+SLOW_REQUEST_THRESHOLD = Var.SLOW_REQUEST_MS / 1000
+
+
+class RequestTimer:
+    __slots__ = ('route', 'enabled', 'started', 'last', 'ttfb', 'phases', 'fields')
+
+    def __init__(self, route: str, enabled: bool = Var.REQUEST_TIMING) -> None:
+        self.route = route
+        self.enabled = enabled
+        self.started = self.last = time.perf_counter() if enabled else 0.0
+        self.ttfb: Optional[float] = None
+        self.phases: Dict[str, float] = {}
+        self.fields: Dict[str, Any] = {}
+
+    def mark(self, phase: str) -> None:
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def first_byte(self) -> None:
+        if self.enabled and self.ttfb is None:
+            self.ttfb = time.perf_counter() - self.started
+
+    def annotate(self, **fields: Any) -> None:
+        if self.enabled:
+            self.fields.update(fields)
+
+    def server_timing(self) -> Dict[str, str]:
+        if not self.enabled:
+            return {}
+        metrics = [f"{phase};dur={seconds * 1000:.2f}" for phase, seconds in self.phases.items()]
+        metrics.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}")
+        return {"Server-Timing": ", ".join(metrics)}
+
+    def finish(self) -> None:
+        if not self.enabled:
+            return
+        total = time.perf_counter() - self.started
+        latency = self.ttfb if self.ttfb is not None else total
+        if latency < SLOW_REQUEST_THRESHOLD or random.random() >= Var.SLOW_REQUEST_SAMPLE_RATE:
+            return
+        record = {
+            "route": self.route,
+            **self.fields,
+            "ttfb_ms": round(latency * 1000, 2),
+            "total_ms": round(total * 1000, 2),
+            "phases": {phase: round(seconds * 1000, 2) for phase, seconds in self.phases.items()}
+        }
+        logger.warning(f"Slow request: {json.dumps(record, default=str)}")
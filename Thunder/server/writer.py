@@ -0,0 +1,168 @@
+# Thunder/server/writer.py
+
+import asyncio
+import itertools
+import os
+import socket
+import time
+from typing import Dict, Optional
+
+from aiohttp import web
+
+from Thunder.utils.logger import logger
+from Thunder.utils.metrics import bytes_served, stream_duration
+from Thunder.vars import Var
+
+WRITE_BUFFER_HIGH = Var.STREAM_WRITE_BUFFER * 1024
+WRITE_BUFFER_LOW = WRITE_BUFFER_HIGH // 4
+SOCKET_SEND_BUFFER = Var.SOCKET_SEND_BUFFER * 1024
+HAS_SENDFILE = hasattr(os, "sendfile")
+
+
+def tune_transport(request: web.Request) -> None:
+    transport = request.transport
+    if transport is None or transport.is_closing():
+        return
+    if WRITE_BUFFER_HIGH > 0:
+        transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH, low=WRITE_BUFFER_LOW)
+
+    sock = transport.get_extra_info("socket")
+    if sock is None or sock.family not in (socket.AF_INET, socket.AF_INET6):
+        return
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if SOCKET_SEND_BUFFER > 0:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_SEND_BUFFER)
+    except OSError as e:
+        logger.debug(f"Could not tune socket options: {e}")
+
+
+def read_segment(path: str, offset: int, count: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(count)
+
+
+async def wait_writable(fd: int) -> None:
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    loop.add_writer(fd, lambda: future.done() or future.set_result(None))
+    try:
+        await future
+    finally:
+        loop.remove_writer(fd)
+
+
+class ActiveStream:
+    __slots__ = ('message_id', 'client_id', 'total', 'bytes_sent', 'sendfile_bytes', 'started', 'transport')
+
+    def __init__(self, request: web.Request, message_id: int, client_id: int, total: int) -> None:
+        self.message_id = message_id
+        self.client_id = client_id
+        self.total = total
+        self.bytes_sent = 0
+        self.sendfile_bytes = 0
+        self.started = time.monotonic()
+        self.transport = request.transport
+
+    @property
+    def buffered(self) -> int:
+        if self.transport is None or self.transport.is_closing():
+            return 0
+        return self.transport.get_write_buffer_size()
+
+    async def write(self, response: web.StreamResponse, data) -> None:
+        await response.write(data)
+        self.bytes_sent += len(data)
+        bytes_served.inc((str(self.client_id),), len(data))
+
+    async def sendfile(self, response: web.StreamResponse, path: str, offset: int, count: int) -> None:
+        if self.transport is None or self.transport.is_closing():
+            raise ConnectionResetError("Connection lost")
+        sock = self.transport.get_extra_info("socket")
+        # Only a Content-Length body without chunked or compressed framing can bypass the response writer.
+        raw_body = response.content_length is not None and not response.chunked and not response.compression
+        if HAS_SENDFILE and raw_body and sock is not None and self.transport.get_extra_info("sslcontext") is None:
+            await self._sendfile(sock.fileno(), path, offset, count)
+            self.bytes_sent += count
+            self.sendfile_bytes += count
+            bytes_served.inc((str(self.client_id),), count)
+            return
+
+        data = await asyncio.to_thread(read_segment, path, offset, count)
+        if len(data) < count:
+            raise FileNotFoundError(f"Disk cache segment {path} is truncated")
+        await self.write(response, data)
+
+    async def _sendfile(self, fd: int, path: str, offset: int, count: int) -> None:
+        # The event loop owns the socket's fd, so readiness is polled on a duplicate of it.
+        out_fd = os.dup(fd)
+        try:
+            while self.transport.get_write_buffer_size():
+                await wait_writable(out_fd)
+                await asyncio.sleep(0)
+            with open(path, "rb") as f:
+                sent = 0
+                while sent < count:
+                    if self.transport.is_closing():
+                        raise ConnectionResetError("Connection lost")
+                    try:
+                        n = os.sendfile(out_fd, f.fileno(), offset + sent, count - sent)
+                    except (BlockingIOError, InterruptedError):
+                        await wait_writable(out_fd)
+                        continue
+                    except (BrokenPipeError, ConnectionError) as e:
+                        raise ConnectionResetError("Connection lost") from e
+                    if n == 0:
+                        if not sent:
+                            raise FileNotFoundError(f"Disk cache segment {path} is truncated")
+                        raise ConnectionError(f"Disk cache segment {path} ended after {sent} bytes")
+                    sent += n
+        finally:
+            os.close(out_fd)
+
+
+class StreamRegistry:
+    __slots__ = ('_streams', '_ids')
+
+    def __init__(self) -> None:
+        self._streams: Dict[int, ActiveStream] = {}
+        self._ids = itertools.count(1)
+
+    def register(self, stream: ActiveStream) -> int:
+        stream_id = next(self._ids)
+        self._streams[stream_id] = stream
+        return stream_id
+
+    def unregister(self, stream_id: Optional[int]) -> None:
+        stream = self._streams.pop(stream_id, None)
+        if stream is not None:
+            stream_duration.observe(time.monotonic() - stream.started)
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        streams = []
+        for stream_id, stream in self._streams.items():
+            elapsed = now - stream.started
+            streams.append({
+                "id": stream_id,
+                "message_id": stream.message_id,
+                "client_id": stream.client_id,
+                "bytes_sent": stream.bytes_sent,
+                "sendfile_bytes": stream.sendfile_bytes,
+                "total": stream.total,
+                "buffered": stream.buffered,
+                "rate": int(stream.bytes_sent / elapsed) if elapsed > 0 else 0
+            })
+        return {
+            "active": len(streams),
+            "buffered_bytes": sum(s["buffered"] for s in streams),
+            "write_buffer_limit": WRITE_BUFFER_HIGH,
+            "streams": streams
+        }
+
+
+active_streams = StreamRegistry()
@@ -0,0 +1,113 @@
+# Thunder/utils/batcher.py
+
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+
+from pyrogram import Client, raw, utils
+from pyrogram.errors import FloodWait
+from pyrogram.types import Message
+
+from Thunder.bot import multi_clients
+from Thunder.utils.load_balancer import load_balancer
+from Thunder.utils.logger import logger
+from Thunder.vars import Var
+
+MAX_BATCH_SIZE = 200
+
+
+class MessageBatcher:
+    __slots__ = ('client', 'chat_id', 'window', '_pending', '_waiters', '_flush_handle', '_tasks')
+
+    def __init__(self, client: Client, chat_id: int, window: float) -> None:
+        self.client = client
+        self.chat_id = chat_id
+        self.window = window
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def get(self, message_id: int) -> Optional[Message]:
+        future = self._pending.get(message_id)
+        if future is None or future.done():
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[message_id] = future
+            if len(self._pending) >= MAX_BATCH_SIZE:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.window, self._flush)
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self._waiters[future] -= 1
+            if not self._waiters[future]:
+                del self._waiters[future]
+                if not future.done():
+                    future.cancel()
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._dispatch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: Dict[int, asyncio.Future]) -> None:
+        message_ids = [message_id for message_id, future in batch.items() if not future.done()]
+        if not message_ids:
+            return
+        try:
+            messages = await self._get_messages(message_ids)
+        except FloodWait as e:
+            client_id = self.client_id
+            if client_id is not None:
+                load_balancer.record_flood_wait(client_id, e.value)
+            logger.debug(f"FloodWait: get_messages batch of {len(message_ids)} on client {client_id}, quarantined for {e.value}s")
+            self._fail(batch, e)
+            return
+        except Exception as e:
+            logger.debug(f"Error fetching message batch {message_ids}: {e}", exc_info=True)
+            self._fail(batch, e)
+            return
+
+        found = {message.id: message for message in messages or [] if message}
+        for message_id, future in batch.items():
+            if not future.done():
+                future.set_result(found.get(message_id))
+
+    @staticmethod
+    def _fail(batch: Dict[int, asyncio.Future], error: Exception) -> None:
+        for future in batch.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def _get_messages(self, message_ids: List[int]) -> List[Message]:
+        peer = await self.client.resolve_peer(self.chat_id)
+        ids = [raw.types.InputMessageID(id=message_id) for message_id in message_ids]
+        if isinstance(peer, raw.types.InputPeerChannel):
+            query = raw.functions.channels.GetMessages(channel=peer, id=ids)
+        else:
+            query = raw.functions.messages.GetMessages(id=ids)
+        result = await self.client.invoke(query, sleep_threshold=0)
+        return await utils.parse_messages(self.client, result, replies=0)
+
+    @property
+    def client_id(self) -> Optional[int]:
+        return next((client_id for client_id, client in multi_clients.items() if client is self.client), None)
+
+
+_batchers: Dict[Tuple[Client, int], MessageBatcher] = {}
+
+
+def get_batcher(client: Client, chat_id: Optional[int] = None) -> MessageBatcher:
+    key = (client, int(chat_id or Var.BIN_CHANNEL))
+    batcher = _batchers.get(key)
+    if batcher is None:
+        batcher = _batchers[key] = MessageBatcher(client, key[1], Var.GET_MESSAGES_BATCH_MS / 1000)
+    return batcher
@@ -11,7 +11,8 @@ from pyrogram.types import (InlineKeyboardButton, InlineKeyboardMarkup,
                             LinkPreviewOptions, Message, User)
 
 from Thunder.utils.database import db
-from Thunder.utils.file_properties import get_fname, get_fsize, get_hash
+from Thunder.utils.file_properties import (get_file_details, get_fname,
+                                           get_fsize, get_hash)
 from Thunder.utils.handler import handle_flood_wait
 from Thunder.utils.human_readable import humanbytes
 from Thunder.utils.logger import logger
@@ -84,6 +85,14 @@ async def gen_links(fwd_msg: Message, shortener: bool = True) -> Dict[str, str]:
     return {"stream_link": slink, "online_link": olink, "media_name": m_name, "media_size": m_size_hr}
 
 
+async def index_file(stored_msg: Message):
+    details = get_file_details(stored_msg)
+    if "error" in details:
+        logger.warning(f"Not indexing message {stored_msg.id}: {details['error']}")
+        return
+    await db.add_file(details)
+
+
 async def gen_dc_txt(usr: User) -> str:
     dc_id_val = usr.dc_id if usr.dc_id is not None else MSG_DC_UNKNOWN
     return MSG_DC_USER_INFO.format(user_name=usr.first_name or 'User', user_id=usr.id, dc_id=dc_id_val)
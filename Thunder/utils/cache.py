@@ -0,0 +1,109 @@
+# Thunder/utils/cache.py
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    __slots__ = ('maxsize', 'ttl', 'max_bytes', 'sizeof', 'size', '_data')
+
+    def __init__(self, maxsize: int, ttl: float, max_bytes: int = 0,
+                 sizeof: Optional[Callable[[Any], int]] = None) -> None:
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.max_bytes = max(0, max_bytes)
+        self.sizeof = sizeof
+        self.size = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any, int]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value, _ = item
+        if expires_at <= time.monotonic():
+            self.pop(key)
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        weight = self.sizeof(value) if self.sizeof is not None else 0
+        self.pop(key)
+        if self.max_bytes and weight > self.max_bytes:
+            return
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value, weight)
+        self.size += weight
+        while len(self._data) > self.maxsize or (self.max_bytes and self.size > self.max_bytes):
+            _, (_, _, evicted) = self._data.popitem(last=False)
+            self.size -= evicted
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        item = self._data.pop(key, None)
+        if item is None:
+            return default
+        self.size -= item[2]
+        return item[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.size = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ChunkCache:
+    __slots__ = ('max_bytes', 'size', 'hits', 'misses', 'evictions', '_data')
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max(0, max_bytes)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, bytes]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        data = self._data.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key: Hashable, data: bytes) -> None:
+        if not data or len(data) > self.max_bytes:
+            return
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._data[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
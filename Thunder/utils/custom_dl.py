@@ -1,71 +1,382 @@
 # Thunder/utils/custom_dl.py
 
 import asyncio
-from typing import Any, AsyncGenerator, Dict
+import time
+from collections import deque
+from typing import (Any, AsyncGenerator, Awaitable, Callable, Dict, List,
+                    Optional, Sequence, Set, Tuple, Union)
 
-from pyrogram import Client
-from pyrogram.errors import FloodWait
+from pyrogram import Client, raw
+from pyrogram.errors import (FileReferenceExpired, FloodWait,
+                             InternalServerError, ServiceUnavailable)
+from pyrogram.file_id import FileId, FileType
 from pyrogram.types import Message
 
-from Thunder.server.exceptions import FileNotFound
+from Thunder.bot import multi_clients, work_loads
+from Thunder.server.exceptions import FileNotFound, ServerBusy
+from Thunder.utils.batcher import get_batcher
+from Thunder.utils.cache import ChunkCache, TTLCache
+from Thunder.utils.database import db
+from Thunder.utils.disk_cache import DiskChunkCache
+from Thunder.utils.file_properties import (get_file_details, get_media,
+                                           get_thumb, parse_fid)
+from Thunder.utils.load_balancer import (MAX_CONCURRENT_PER_CLIENT,
+                                         load_balancer)
 from Thunder.utils.logger import logger
+from Thunder.utils.metrics import upstream_fetch
+from Thunder.utils.singleflight import SingleFlight
 from Thunder.vars import Var
 
+CHUNK_SIZE = 1024 * 1024
+MIN_PART_SIZE = 4 * 1024
+FAILOVER_ERRORS = (FloodWait, OSError, asyncio.TimeoutError, InternalServerError, ServiceUnavailable)
+
+file_info_cache = TTLCache(Var.CACHE_SIZE, Var.CACHE_TTL)
+file_id_cache = TTLCache(Var.CACHE_SIZE * 4, Var.CACHE_TTL)
+chunk_cache = ChunkCache(Var.CHUNK_CACHE_SIZE * CHUNK_SIZE)
+disk_cache = DiskChunkCache(Var.DISK_CACHE_DIR, Var.DISK_CACHE_SIZE * CHUNK_SIZE)
+message_flight = SingleFlight()
+info_flight = SingleFlight()
+file_id_flight = SingleFlight()
+chunk_flight = SingleFlight()
+
+def plan_part(start: int, end: int) -> Tuple[int, int]:
+    limit = MIN_PART_SIZE
+    while limit < CHUNK_SIZE:
+        part_offset = start - start % limit
+        if part_offset + limit >= end:
+            return part_offset, limit
+        limit *= 2
+    return 0, CHUNK_SIZE
+
+def plan_range(offset: int, end: int) -> List[Tuple[int, int, int]]:
+    if end <= offset:
+        return []
+    first, last = offset // CHUNK_SIZE, (end - 1) // CHUNK_SIZE
+    return [
+        (
+            index,
+            offset - index * CHUNK_SIZE if index == first else 0,
+            end - index * CHUNK_SIZE if index == last else CHUNK_SIZE
+        )
+        for index in range(first, last + 1)
+    ]
+
+def get_location(file_id: FileId) -> Union[raw.types.InputPhotoFileLocation, raw.types.InputDocumentFileLocation]:
+    if file_id.file_type == FileType.PHOTO:
+        return raw.types.InputPhotoFileLocation(
+            id=file_id.media_id,
+            access_hash=file_id.access_hash,
+            file_reference=file_id.file_reference,
+            thumb_size=file_id.thumbnail_size
+        )
+    return raw.types.InputDocumentFileLocation(
+        id=file_id.media_id,
+        access_hash=file_id.access_hash,
+        file_reference=file_id.file_reference,
+        thumb_size=file_id.thumbnail_size
+    )
+
 class ByteStreamer:
-    __slots__ = ('client', 'chat_id')
+    __slots__ = ('client', 'client_id', 'chat_id')
 
-    def __init__(self, client: Client) -> None:
+    def __init__(self, client: Client, client_id: int = 0) -> None:
         self.client = client
+        self.client_id = client_id
         self.chat_id = int(Var.BIN_CHANNEL)
 
     async def get_message(self, message_id: int) -> Message:
-        while True:
-            try:
-                message = await self.client.get_messages(self.chat_id, message_id)
-                break
-            except FloodWait as e:
-                logger.debug(f"FloodWait: get_message, sleep {e.value}s")
-                await asyncio.sleep(e.value)
-            except Exception as e:
-                logger.debug(f"Error fetching message {message_id}: {e}", exc_info=True)
-                raise FileNotFound(f"Message {message_id} not found") from e
+        return await message_flight.do((self.client_id, message_id), self._fetch_message, message_id)
+
+    async def _fetch_message(self, message_id: int) -> Message:
+        try:
+            message = await get_batcher(self.client, self.chat_id).get(message_id)
+        except FloodWait:
+            raise
+        except Exception as e:
+            logger.debug(f"Error fetching message {message_id}: {e}", exc_info=True)
+            raise FileNotFound(f"Message {message_id} not found") from e
         
         if not message or not message.media:
             raise FileNotFound(f"Message {message_id} not found")
         return message
 
-    async def stream_file(self, message_id: int, offset: int = 0, limit: int = 0) -> AsyncGenerator[bytes, None]:
+    async def get_file_properties(self, message_id: int, refresh: bool = False) -> Dict[str, Any]:
+        file_info = None if refresh else file_info_cache.get(message_id)
+        if file_info is None:
+            file_info = await info_flight.do((message_id, refresh), self._load_file_info, message_id, refresh)
+        return file_info
+
+    async def _load_file_info(self, message_id: int, refresh: bool) -> Dict[str, Any]:
+        details = None if refresh else await db.get_file(message_id)
+        if not details:
+            streamer, excluded = self, set()
+            while True:
+                try:
+                    message = await streamer.get_message(message_id)
+                    break
+                except FloodWait as e:
+                    excluded.add(streamer.client_id)
+                    streamer = self.pick_replacement(excluded)
+                    if streamer is None or streamer.client_id in excluded:
+                        raise ServerBusy("Every client is waiting out a FloodWait", retry_after=e.value) from e
+                    logger.debug(f"Looking up message {message_id} on client {streamer.client_id} after a FloodWait")
+            details = get_file_details(message)
+            details["client_id"] = streamer.client_id
+            if "error" not in details:
+                await db.add_file(details)
+
+        file_info = self.build_file_info(details)
+        if "error" in file_info or not file_info.get("file_id"):
+            raise FileNotFound(f"Message {message_id} has no streamable media")
+        file_info_cache.set(message_id, file_info)
+        return file_info
+
+    async def get_file_id(self, file_info: Dict[str, Any]) -> FileId:
+        if file_info.get('client_id', 0) == self.client_id and file_info.get('file_id'):
+            return file_info['file_id']
+        key = (self.client_id, file_info['message_id'])
+        file_id = file_id_cache.get(key)
+        if file_id is None:
+            file_id = await file_id_flight.do(key, self._resolve_file_id, file_info['message_id'])
+        return file_id
+
+    async def _resolve_file_id(self, message_id: int) -> FileId:
         message = await self.get_message(message_id)
-        
-        chunk_offset = offset // (1024 * 1024)
-        chunk_limit = (limit + (1024 * 1024) - 1) // (1024 * 1024) if limit > 0 else 0
+        file_id = parse_fid(message)
+        if file_id is None:
+            raise FileNotFound(f"Message {message_id} has no streamable media")
+        file_id_cache.set((self.client_id, message_id), file_id)
+        return file_id
+
+    async def get_thumb_id(self, file_info: Dict[str, Any]) -> Optional[str]:
+        if file_info.get('client_id', 0) == self.client_id:
+            return file_info.get('thumb_id')
+        message = await self.get_message(file_info['message_id'])
+        return getattr(get_thumb(get_media(message)), 'file_id', None)
+
+    async def get_chunk(self, file_info: Dict[str, Any], index: int, coalesce: bool = True) -> Union[bytes, memoryview]:
+        key = (file_info['unique_id'], index)
+        chunk = chunk_cache.get(key)
+        if chunk is None:
+            chunk = await disk_cache.get(key)
+        if chunk is None:
+            if coalesce:
+                chunk = await chunk_flight.do(key, self._fetch_chunk, file_info, index)
+            else:
+                chunk = await self._fetch_chunk(file_info, index)
+        return chunk
+
+    async def fill_chunk(self, file_info: Dict[str, Any], index: int, keep_in_memory: bool = False) -> None:
+        key = (file_info['unique_id'], index)
+        if key in disk_cache or (keep_in_memory and key in chunk_cache):
+            return
+        await chunk_flight.do(key, self._fetch_chunk, file_info, index, keep_in_memory)
+
+    async def _fetch_chunk(self, file_info: Dict[str, Any], index: int, keep_in_memory: bool = True) -> bytes:
+        chunk = await self._with_file_retry(file_info, self._download_chunk, index)
+        if keep_in_memory:
+            chunk_cache.put((file_info['unique_id'], index), chunk)
+        disk_cache.put((file_info['unique_id'], index), chunk)
+        return chunk
+
+    async def _download_chunk(self, file_info: Dict[str, Any], file_id: FileId, index: int) -> bytes:
+        chunk = await self._download_part(file_info, file_id, index * CHUNK_SIZE, CHUNK_SIZE)
+        if chunk is not None:
+            return chunk
+        chunks = [chunk async for chunk in self.client.get_file(file_id, file_info['file_size'], 1, index)]
+        return chunks[0] if chunks else b""
+
+    async def get_piece(
+        self,
+        file_info: Dict[str, Any],
+        index: int,
+        start: int,
+        end: int,
+        coalesce: bool = True
+    ) -> Union[bytes, memoryview]:
+        if start == 0 and (end >= CHUNK_SIZE or index * CHUNK_SIZE + end >= file_info['file_size']):
+            return await self.get_chunk(file_info, index, coalesce)
+
+        key = (file_info['unique_id'], index)
+        chunk = chunk_cache.get(key)
+        if chunk is None:
+            piece = await disk_cache.get(key, start, end)
+            if piece is not None:
+                return piece
+            part_offset, part_limit = plan_part(start, end)
+            if part_limit < CHUNK_SIZE:
+                offset = index * CHUNK_SIZE + part_offset
+                if coalesce:
+                    part = await chunk_flight.do(
+                        (file_info['unique_id'], offset, part_limit),
+                        self._with_file_retry, file_info, self._download_part, offset, part_limit
+                    )
+                else:
+                    part = await self._with_file_retry(file_info, self._download_part, offset, part_limit)
+                if part is not None:
+                    return part[start - part_offset:end - part_offset]
+            chunk = await self.get_chunk(file_info, index, coalesce)
+        return memoryview(chunk)[start:end]
+
+    async def _download_part(self, file_info: Dict[str, Any], file_id: FileId, offset: int, limit: int) -> Optional[bytes]:
+        async with self.client.get_file_semaphore:
+            session = await self.client.get_session(file_id.dc_id, is_media=True)
+            result = await session.invoke(
+                raw.functions.upload.GetFile(location=get_location(file_id), offset=offset, limit=limit),
+                sleep_threshold=0
+            )
+        if isinstance(result, raw.types.upload.File):
+            return result.bytes
+        return None
+
+    async def _with_file_retry(self, file_info: Dict[str, Any], fetch: Callable[..., Awaitable[Any]], *args) -> Any:
+        message_id = file_info['message_id']
+        file_info = file_info_cache.get(message_id) or file_info
+        refreshed = False
 
         while True:
+            file_id = await self.get_file_id(file_info)
+            started = time.monotonic()
             try:
-                async for chunk in self.client.stream_media(message, offset=chunk_offset, limit=chunk_limit):
-                    yield chunk
-                break
+                result = await fetch(file_info, file_id, *args)
             except FloodWait as e:
-                logger.debug(f"FloodWait: stream_file, sleep {e.value}s")
-                await asyncio.sleep(e.value)
+                load_balancer.record_flood_wait(self.client_id, e.value)
+                logger.debug(f"FloodWait: {fetch.__name__} on client {self.client_id}, quarantined for {e.value}s")
+                raise
+            except FileReferenceExpired:
+                if refreshed:
+                    raise
+                logger.debug(f"File reference expired for message {message_id} on client {self.client_id}, refreshing metadata")
+                file_id_cache.pop((self.client_id, message_id))
+                file_info = await self.get_file_properties(message_id, refresh=True)
+                refreshed = True
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                load_balancer.record_error(self.client_id)
+                raise
+            else:
+                elapsed = time.monotonic() - started
+                load_balancer.record_success(self.client_id, len(result or b""), elapsed)
+                upstream_fetch.observe(elapsed, (str(self.client_id),))
+                return result
+
+    async def stream_file(
+        self,
+        message_id: int,
+        offset: int = 0,
+        limit: int = 0,
+        peers: Sequence["ByteStreamer"] = ()
+    ) -> AsyncGenerator[Union[bytes, memoryview], None]:
+        file_info = await self.get_file_properties(message_id)
+        end = offset + limit if limit > 0 else file_info['file_size']
+        pieces = iter(plan_range(offset, end))
+        fetchers = [self, *peers]
+        depth = max(1, Var.STREAM_READAHEAD, len(fetchers))
+        pending = deque()
+        borrowed: List[int] = []
+
+        def schedule(piece: Tuple[int, int, int], fetcher: Optional["ByteStreamer"] = None, coalesce: bool = True) -> None:
+            index, start, stop = piece
+            fetcher = fetcher or fetchers[index % len(fetchers)]
+            task = asyncio.ensure_future(fetcher.get_piece(file_info, index, start, stop, coalesce))
+            pending.append((piece, fetcher, task))
+
+        def replace(failed: "ByteStreamer", replacement: "ByteStreamer") -> None:
+            if replacement.client_id not in {f.client_id for f in fetchers} | set(borrowed):
+                work_loads[replacement.client_id] += 1
+                borrowed.append(replacement.client_id)
+            fetchers[:] = [replacement if f is failed else f for f in fetchers]
+            queued = list(pending)
+            pending.clear()
+            for piece, fetcher, task in queued:
+                if fetcher is failed and (not task.done() or task.cancelled() or task.exception() is not None):
+                    task.cancel()
+                    schedule(piece, replacement, coalesce=False)
+                else:
+                    pending.append((piece, fetcher, task))
+
+        async def resume(piece: Tuple[int, int, int], failed: "ByteStreamer", error: Exception) -> Union[bytes, memoryview]:
+            index, start, stop = piece
+            excluded = {failed.client_id}
+            for _ in range(len(multi_clients) + 1):
+                replacement = self.pick_replacement(excluded)
+                if replacement is None:
+                    break
+                logger.warning(
+                    f"Client {failed.client_id} failed on message {message_id} chunk {index} "
+                    f"({type(error).__name__}), resuming on client {replacement.client_id}"
+                )
+                wait = load_balancer.throttle_remaining(replacement.client_id)
+                if wait:
+                    await asyncio.sleep(wait)
+                if replacement is not failed:
+                    replace(failed, replacement)
+                try:
+                    return await replacement.get_piece(file_info, index, start, stop, coalesce=False)
+                except FAILOVER_ERRORS as e:
+                    excluded.add(replacement.client_id)
+                    failed, error = replacement, e
+            raise error
+
+        try:
+            for piece in pieces:
+                schedule(piece)
+                if len(pending) >= depth:
+                    break
+            while pending:
+                piece, fetcher, task = pending.popleft()
+                try:
+                    chunk = await task
+                except FAILOVER_ERRORS as e:
+                    chunk = await resume(piece, fetcher, e)
+                if not chunk:
+                    break
+                piece = next(pieces, None)
+                if piece is not None:
+                    schedule(piece)
+                yield chunk
+        finally:
+            for _, _, task in pending:
+                task.cancel()
+            for client_id in borrowed:
+                work_loads[client_id] -= 1
+
+    @staticmethod
+    def pick_replacement(excluded: Set[int]) -> Optional["ByteStreamer"]:
+        client_id = load_balancer.select(MAX_CONCURRENT_PER_CLIENT, exclude=excluded)
+        if client_id is None:
+            client_id = load_balancer.select(MAX_CONCURRENT_PER_CLIENT)
+        return get_streamer(client_id) if client_id is not None else None
+
+    @staticmethod
+    def build_file_info(details: Dict[str, Any]) -> Dict[str, Any]:
+        file_info = dict(details)
+        file_id = file_info.get("file_id")
+        if isinstance(file_id, str):
+            try:
+                file_info["file_id"] = FileId.decode(file_id)
+            except Exception as e:
+                logger.debug(f"Invalid file_id for message {file_info.get('message_id')}: {e}")
+                file_info["file_id"] = None
+        return file_info
 
     def get_file_info_sync(self, message: Message) -> Dict[str, Any]:
-        media = message.document or message.video or message.audio or message.photo
-        if not media:
-            return {"message_id": message.id, "error": "No media"}
-        return {
-            "message_id": message.id,
-            "file_size": getattr(media, 'file_size', 0) or 0,
-            "file_name": getattr(media, 'file_name', None),
-            "mime_type": getattr(media, 'mime_type', None),
-            "unique_id": getattr(media, 'file_unique_id', None),
-            "media_type": type(media).__name__.lower()
-        }
+        return self.build_file_info(get_file_details(message))
 
     async def get_file_info(self, message_id: int) -> Dict[str, Any]:
         try:
-            message = await self.get_message(message_id)
-            return self.get_file_info_sync(message)
+            return await self.get_file_properties(message_id)
+        except ServerBusy:
+            raise
         except Exception as e:
             logger.debug(f"Error getting file info for {message_id}: {e}", exc_info=True)
             return {"message_id": message_id, "error": str(e)}
+
+streamers: Dict[int, ByteStreamer] = {}
+
+def get_streamer(client_id: int) -> ByteStreamer:
+    if client_id not in streamers:
+        streamers[client_id] = ByteStreamer(multi_clients[client_id], client_id)
+    return streamers[client_id]
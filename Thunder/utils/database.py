@@ -15,6 +15,7 @@ class Database:
         self.token_col: AsyncIOMotorCollection = self.db.tokens
         self.authorized_users_col: AsyncIOMotorCollection = self.db.authorized_users
         self.restart_message_col: AsyncIOMotorCollection = self.db.restart_message
+        self.files_col: AsyncIOMotorCollection = self.db.files
 
     async def ensure_indexes(self):
         try:
@@ -26,6 +27,8 @@ class Database:
             await self.token_col.create_index("activated")
             await self.restart_message_col.create_index("message_id", unique=True)
             await self.restart_message_col.create_index("timestamp", expireAfterSeconds=3600)
+            await self.files_col.create_index("message_id", unique=True)
+            await self.files_col.create_index("unique_id")
 
             logger.debug("Database indexes ensured.")
         except Exception as e:
@@ -165,6 +168,24 @@ class Database:
         except Exception as e:
             logger.error(f"Error deleting restart message {message_id}: {e}", exc_info=True)
 
+    async def add_file(self, file_info: Dict[str, Any]) -> None:
+        try:
+            await self.files_col.update_one(
+                {"message_id": file_info["message_id"]},
+                {"$set": file_info},
+                upsert=True
+            )
+            logger.debug(f"Indexed file for message {file_info['message_id']}.")
+        except Exception as e:
+            logger.error(f"Error indexing file for message {file_info.get('message_id')}: {e}", exc_info=True)
+
+    async def get_file(self, message_id: int) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.files_col.find_one({"message_id": message_id}, {"_id": 0})
+        except Exception as e:
+            logger.error(f"Error getting indexed file for message {message_id}: {e}", exc_info=True)
+            return None
+
     async def close(self):
         if self._client:
             self._client.close()
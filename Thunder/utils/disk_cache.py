@@ -0,0 +1,198 @@
+# Thunder/utils/disk_cache.py
+
+import asyncio
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from Thunder.utils.logger import logger
+
+SEGMENT_SUFFIX = ".seg"
+SAFE_NAME_REGEX = re.compile(r'^[a-zA-Z0-9_-]+$')
+
+ChunkKey = Tuple[str, int]
+
+
+class DiskChunkCache:
+    __slots__ = ('directory', 'max_bytes', 'size', 'hits', 'misses', 'evictions', '_index', '_present', '_writing', '_tasks')
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max(0, max_bytes)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._index: "OrderedDict[ChunkKey, int]" = OrderedDict()
+        self._present: Dict[str, int] = {}
+        self._writing: Set[ChunkKey] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        if self.enabled:
+            self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: ChunkKey) -> str:
+        unique_id, index = key
+        return os.path.join(self.directory, unique_id, f"{index:08d}{SEGMENT_SUFFIX}")
+
+    def _load_index(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        segments = []
+        for file_dir in os.scandir(self.directory):
+            if not file_dir.is_dir() or not SAFE_NAME_REGEX.match(file_dir.name):
+                continue
+            for entry in os.scandir(file_dir.path):
+                if not entry.name.endswith(SEGMENT_SUFFIX):
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+                    continue
+                try:
+                    index = int(entry.name[:-len(SEGMENT_SUFFIX)])
+                    stat = entry.stat()
+                except (ValueError, OSError):
+                    continue
+                if stat.st_size:
+                    segments.append((stat.st_mtime, (file_dir.name, index), stat.st_size))
+
+        for _, key, size in sorted(segments):
+            self._add(key, size)
+        self._remove_segments(self._evict())
+        logger.debug(f"Disk cache loaded {len(self._index)} segments ({self.size} bytes) from {self.directory}")
+
+    async def get(self, key: ChunkKey, start: int = 0, end: Optional[int] = None) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        if key not in self._index:
+            self.misses += 1
+            return None
+        path = self._path(key)
+        try:
+            data = await asyncio.to_thread(self._read_segment, path, start, end)
+        except OSError as e:
+            logger.debug(f"Dropping unreadable disk cache segment {path}: {e}")
+            self._discard(key)
+            self.misses += 1
+            return None
+        if key in self._index:
+            self._index.move_to_end(key)
+        self.hits += 1
+        return data
+
+    @staticmethod
+    def _read_segment(path: str, start: int, end: Optional[int]) -> bytes:
+        with open(path, "rb") as f:
+            data = f.read() if end is None else os.pread(f.fileno(), end - start, start)
+        os.utime(path)
+        return data
+
+    async def path(self, key: ChunkKey) -> Optional[str]:
+        if not self.enabled or key not in self._index:
+            return None
+        path = self._path(key)
+        try:
+            await asyncio.to_thread(os.utime, path)
+        except OSError as e:
+            logger.debug(f"Dropping missing disk cache segment {path}: {e}")
+            self._discard(key)
+            return None
+        if key in self._index:
+            self._index.move_to_end(key)
+        self.hits += 1
+        return path
+
+    def __contains__(self, key: ChunkKey) -> bool:
+        return key in self._index
+
+    def bitmap(self, unique_id: str) -> int:
+        return self._present.get(unique_id, 0)
+
+    def missing(self, unique_id: str, count: int) -> List[int]:
+        bitmap = self.bitmap(unique_id)
+        return [index for index in range(count) if not bitmap >> index & 1]
+
+    def _add(self, key: ChunkKey, size: int) -> None:
+        unique_id, index = key
+        self._index[key] = size
+        self.size += size
+        self._present[unique_id] = self._present.get(unique_id, 0) | 1 << index
+
+    def _discard(self, key: ChunkKey) -> int:
+        size = self._index.pop(key, 0)
+        self.size -= size
+        unique_id, index = key
+        bitmap = self._present.get(unique_id, 0) & ~(1 << index)
+        if bitmap:
+            self._present[unique_id] = bitmap
+        else:
+            self._present.pop(unique_id, None)
+        return size
+
+    def put(self, key: ChunkKey, data: bytes) -> None:
+        if not self.enabled or not data or len(data) > self.max_bytes:
+            return
+        if key in self._index or key in self._writing or not SAFE_NAME_REGEX.match(key[0]):
+            return
+        self._writing.add(key)
+        task = asyncio.ensure_future(self._store(key, data))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _store(self, key: ChunkKey, data: bytes) -> None:
+        try:
+            await asyncio.to_thread(self._write_segment, self._path(key), data)
+        except OSError as e:
+            logger.warning(f"Failed to write disk cache segment {key}: {e}")
+            return
+        finally:
+            self._writing.discard(key)
+        self._add(key, len(data))
+        evicted = self._evict()
+        if evicted:
+            await asyncio.to_thread(self._remove_segments, evicted)
+
+    @staticmethod
+    def _write_segment(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _evict(self) -> List[str]:
+        evicted = []
+        while self.size > self.max_bytes and self._index:
+            key = next(iter(self._index))
+            self._discard(key)
+            self.evictions += 1
+            evicted.append(self._path(key))
+        return evicted
+
+    @staticmethod
+    def _remove_segments(paths: List[str]) -> None:
+        for path in paths:
+            try:
+                os.remove(path)
+                if not os.listdir(os.path.dirname(path)):
+                    os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "segments": len(self._index),
+            "files": len(self._present),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
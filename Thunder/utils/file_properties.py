@@ -1,14 +1,14 @@
 # Thunder/utils/file_properties.py
 
 from datetime import datetime as dt
-from typing import Any, Optional
+from typing import Any, Dict, Optional
 
 from pyrogram.client import Client
 from pyrogram.file_id import FileId
 from pyrogram.types import Message
 
 from Thunder.server.exceptions import FileNotFound
-from Thunder.utils.handler import handle_flood_wait
+from Thunder.utils.batcher import get_batcher
 from Thunder.utils.logger import logger
 
 
@@ -16,12 +16,17 @@ def get_media(message: Message) -> Optional[Any]:
     for attr in ("audio", "document", "photo", "sticker", "animation", "video", "voice", "video_note"):
         media = getattr(message, attr, None)
         if media:
-            if hasattr(media, 'thumbs') and media.thumbs:
-                pass
             return media
     return None
 
 
+def get_thumb(media: Any) -> Optional[Any]:
+    thumbs = getattr(media, 'thumbs', None)
+    if not thumbs:
+        return None
+    return max(thumbs, key=lambda thumb: (thumb.width or 0) * (thumb.height or 0))
+
+
 def get_uniqid(message: Message) -> Optional[str]:
     media = get_media(message)
     return getattr(media, 'file_unique_id', None)
@@ -82,9 +87,26 @@ def get_fname(msg: Message) -> str:
     return fname
 
 
+def get_file_details(message: Message) -> Dict[str, Any]:
+    media = get_media(message)
+    if not media:
+        return {"message_id": message.id, "error": "No media"}
+    return {
+        "message_id": message.id,
+        "file_size": getattr(media, 'file_size', 0) or 0,
+        "file_name": get_fname(message),
+        "mime_type": getattr(media, 'mime_type', None),
+        "unique_id": getattr(media, 'file_unique_id', None),
+        "media_type": type(media).__name__.lower(),
+        "file_id": getattr(media, 'file_id', None),
+        "date": int(message.date.timestamp()) if message.date else None,
+        "thumb_id": getattr(get_thumb(media), 'file_id', None)
+    }
+
+
 async def get_fids(client: Client, chat_id: int, message_id: int) -> FileId:
     try:
-        msg = await handle_flood_wait(client.get_messages, chat_id, message_id)
+        msg = await get_batcher(client, chat_id).get(message_id)
         
         if not msg or getattr(msg, 'empty', False):
             raise FileNotFound("Message not found")
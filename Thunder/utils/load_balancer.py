@@ -0,0 +1,115 @@
+# Thunder/utils/load_balancer.py
+
+import random
+import time
+from typing import Dict, Iterable, List, Optional
+
+from Thunder.bot import work_loads
+
+CHUNK_SIZE = 1024 * 1024
+MAX_CONCURRENT_PER_CLIENT = 8
+EWMA_ALPHA = 0.2
+DEFAULT_LATENCY = 0.3
+DEFAULT_THROUGHPUT = 4 * CHUNK_SIZE
+MIN_THROUGHPUT_SAMPLE = 256 * 1024
+
+
+class ClientStats:
+    __slots__ = ('latency', 'throughput', 'error_rate', 'requests', 'errors',
+                 'bytes_fetched', 'flood_waits', 'flood_wait_seconds', 'flood_wait_until')
+
+    def __init__(self) -> None:
+        self.latency = DEFAULT_LATENCY
+        self.throughput = float(DEFAULT_THROUGHPUT)
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.bytes_fetched = 0
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0
+        self.flood_wait_until = 0.0
+
+
+def _ewma(current: float, sample: float) -> float:
+    return current + EWMA_ALPHA * (sample - current)
+
+
+class LoadBalancer:
+    __slots__ = ('_stats',)
+
+    def __init__(self) -> None:
+        self._stats: Dict[int, ClientStats] = {}
+
+    def stats(self, client_id: int) -> ClientStats:
+        stats = self._stats.get(client_id)
+        if stats is None:
+            stats = self._stats[client_id] = ClientStats()
+        return stats
+
+    def record_success(self, client_id: int, nbytes: int, elapsed: float) -> None:
+        stats = self.stats(client_id)
+        stats.requests += 1
+        stats.bytes_fetched += nbytes
+        stats.latency = _ewma(stats.latency, elapsed)
+        stats.error_rate = _ewma(stats.error_rate, 0.0)
+        if nbytes >= MIN_THROUGHPUT_SAMPLE and elapsed > 0:
+            stats.throughput = _ewma(stats.throughput, nbytes / elapsed)
+
+    def record_error(self, client_id: int) -> None:
+        stats = self.stats(client_id)
+        stats.requests += 1
+        stats.errors += 1
+        stats.error_rate = _ewma(stats.error_rate, 1.0)
+
+    def record_flood_wait(self, client_id: int, seconds: int) -> None:
+        stats = self.stats(client_id)
+        stats.flood_waits += 1
+        stats.flood_wait_seconds += seconds
+        stats.flood_wait_until = max(stats.flood_wait_until, time.monotonic() + seconds)
+        stats.error_rate = _ewma(stats.error_rate, 1.0)
+
+    def is_throttled(self, client_id: int) -> bool:
+        return self.stats(client_id).flood_wait_until > time.monotonic()
+
+    def throttle_remaining(self, client_id: int) -> float:
+        return max(0.0, self.stats(client_id).flood_wait_until - time.monotonic())
+
+    def expected_time(self, client_id: int) -> float:
+        stats = self.stats(client_id)
+        service_time = stats.latency + CHUNK_SIZE / max(stats.throughput, 1.0)
+        penalty = 1.0 / (1.0 - min(stats.error_rate, 0.9))
+        return (work_loads.get(client_id, 0) + 1) * service_time * penalty
+
+    def rank(self, max_load: int, exclude: Iterable[int] = ()) -> List[int]:
+        excluded = set(exclude)
+        candidates = [cid for cid in work_loads if cid not in excluded]
+        healthy = [cid for cid in candidates if not self.is_throttled(cid)]
+        with_capacity = [cid for cid in healthy if work_loads[cid] < max_load]
+        pool = with_capacity or healthy or candidates
+        random.shuffle(pool)
+        return sorted(pool, key=self.expected_time)
+
+    def select(self, max_load: int, exclude: Iterable[int] = ()) -> Optional[int]:
+        ranked = self.rank(max_load, exclude)
+        return ranked[0] if ranked else None
+
+    def snapshot(self) -> Dict[str, dict]:
+        snapshot = {}
+        for client_id in sorted(work_loads):
+            stats = self.stats(client_id)
+            snapshot[str(client_id)] = {
+                "load": work_loads[client_id],
+                "expected_time": round(self.expected_time(client_id), 4),
+                "latency": round(stats.latency, 4),
+                "throughput": int(stats.throughput),
+                "error_rate": round(stats.error_rate, 4),
+                "requests": stats.requests,
+                "errors": stats.errors,
+                "bytes_fetched": stats.bytes_fetched,
+                "flood_waits": stats.flood_waits,
+                "flood_wait_remaining": int(self.throttle_remaining(client_id))
+            }
+        return snapshot
+
+
+load_balancer = LoadBalancer()
@@ -0,0 +1,144 @@
+# Thunder/utils/metrics.py
+
+import asyncio
+import bisect
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from aiohttp import web
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DURATION_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 1800.0, 3600.0)
+LOOP_LAG_INTERVAL = 1.0
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    __slots__ = ('name', 'help', 'labels', 'values')
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return render_samples("counter", self.name, self.help, self.labels, sorted(self.values.items()))
+
+
+class Histogram:
+    __slots__ = ('name', 'help', 'labels', 'buckets', 'values')
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[Labels, list] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            entry[0][index] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _format_labels(self.labels, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.labels, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {count}")
+        return lines
+
+
+def render_samples(kind: str, name: str, help: str, labels: Sequence[str],
+                   samples: Iterable[Tuple[Labels, float]]) -> List[str]:
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for values, value in samples:
+        lines.append(f"{name}{_format_labels(labels, values)} {_format_value(value)}")
+    return lines
+
+
+http_requests = Counter("thunder_http_requests_total", "HTTP requests by route and status.", ("route", "status"))
+http_ttfb = Histogram("thunder_http_ttfb_seconds", "Time from request start until the first response body byte is written.", ("route",))
+stream_duration = Histogram("thunder_stream_duration_seconds", "Total duration of media streams.", buckets=DURATION_BUCKETS)
+bytes_served = Counter("thunder_bytes_served_total", "Media bytes written to HTTP clients.", ("client_id",))
+upstream_fetch = Histogram("thunder_upstream_fetch_seconds", "Latency of Telegram file fetches.", ("client_id",))
+loop_lag = Histogram("thunder_event_loop_lag_seconds", "Event loop scheduling delay.")
+last_loop_lag = 0.0
+
+
+def route_label(request: web.Request) -> str:
+    match_info = request.match_info
+    if match_info is None or match_info.http_exception is not None:
+        return "unmatched"
+    return match_info.route.resource.canonical if match_info.route.resource else "unmatched"
+
+
+@web.middleware
+async def metrics_middleware(request: web.Request, handler):
+    request["started"] = time.monotonic()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    except asyncio.CancelledError:
+        status = 499
+        raise
+    finally:
+        http_requests.inc((route_label(request), str(status)))
+
+
+def observe_ttfb(request: web.Request) -> None:
+    started = request.get("started")
+    if started is not None and not request.get("first_byte"):
+        request["first_byte"] = True
+        http_ttfb.observe(time.monotonic() - started, (route_label(request),))
+
+
+async def record_ttfb(request: web.Request, response: web.StreamResponse) -> None:
+    # Buffered responses write their body right after the headers; streams call observe_ttfb on their first write.
+    if isinstance(response, web.Response):
+        observe_ttfb(request)
+
+
+async def monitor_loop_lag() -> None:
+    global last_loop_lag
+    while True:
+        started = time.monotonic()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        last_loop_lag = max(0.0, time.monotonic() - started - LOOP_LAG_INTERVAL)
+        loop_lag.observe(last_loop_lag)
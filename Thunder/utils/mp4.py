@@ -0,0 +1,203 @@
+# Thunder/utils/mp4.py
+
+import asyncio
+import math
+import struct
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from Thunder.bot import work_loads
+from Thunder.utils.cache import TTLCache
+from Thunder.utils.custom_dl import ByteStreamer, get_streamer
+from Thunder.utils.load_balancer import (MAX_CONCURRENT_PER_CLIENT,
+                                         load_balancer)
+from Thunder.utils.logger import logger
+from Thunder.utils.singleflight import SingleFlight
+from Thunder.vars import Var
+
+MP4_MIME_TYPES = ('video/mp4', 'audio/mp4', 'video/quicktime', 'video/x-m4v', 'audio/x-m4a', 'audio/m4a')
+INDEX_BOXES = ('ftyp', 'moov', 'sidx')
+MAX_TOP_LEVEL_BOXES = 64
+MAX_INDEX_BYTES = 32 * 1024 * 1024
+BOX_HEADER_SIZE = 16
+FAILED_INDEX_TTL = 60
+
+mp4_indexes = TTLCache(
+    Var.CACHE_SIZE, Var.CACHE_TTL,
+    max_bytes=max(1, Var.MP4_INDEX_CACHE_SIZE) * 1024 * 1024,
+    sizeof=lambda index: index.size_bytes if index else 0
+)
+index_flight = SingleFlight()
+_tasks: Set[asyncio.Task] = set()
+
+
+class SidxReference:
+    __slots__ = ('offset', 'size', 'duration')
+
+    def __init__(self, offset: int, size: int, duration: float) -> None:
+        self.offset = offset
+        self.size = size
+        self.duration = duration
+
+
+class Mp4Index:
+    __slots__ = ('boxes', 'regions', 'references')
+
+    def __init__(self) -> None:
+        self.boxes: List[Tuple[str, int, int]] = []
+        self.regions: List[Tuple[int, bytes]] = []
+        self.references: List[SidxReference] = []
+
+    def box(self, box_type: str) -> Optional[Tuple[str, int, int]]:
+        return next((box for box in self.boxes if box[0] == box_type), None)
+
+    @property
+    def fragmented(self) -> bool:
+        return self.box('moof') is not None
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(len(data) for _, data in self.regions)
+
+    def read(self, start: int, stop: int) -> Optional[memoryview]:
+        for offset, data in self.regions:
+            if offset <= start < offset + len(data):
+                return memoryview(data)[start - offset:min(stop, offset + len(data)) - offset]
+        return None
+
+
+def build_hls_playlist(index: Mp4Index, media_url: str) -> Optional[str]:
+    moov = index.box('moov')
+    if not index.fragmented or not index.references or moov is None:
+        return None
+
+    init_size = moov[1] + moov[2]
+    target_duration = max(1, math.ceil(max(ref.duration for ref in index.references)))
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:7",
+        f"#EXT-X-TARGETDURATION:{target_duration}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+        "#EXT-X-INDEPENDENT-SEGMENTS",
+        f'#EXT-X-MAP:URI="{media_url}",BYTERANGE="{init_size}@0"'
+    ]
+    for ref in index.references:
+        lines.append(f"#EXTINF:{ref.duration:.3f},")
+        lines.append(f"#EXT-X-BYTERANGE:{ref.size}@{ref.offset}")
+        lines.append(media_url)
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def is_mp4(file_info: Dict[str, Any]) -> bool:
+    return (file_info.get('mime_type') or '').lower() in MP4_MIME_TYPES
+
+
+def parse_sidx(data: bytes, box_end: int) -> List[SidxReference]:
+    header_size = 16 if struct.unpack_from('>I', data)[0] == 1 else 8
+    version = data[header_size]
+    timescale = struct.unpack_from('>I', data, header_size + 8)[0] or 1
+    position = header_size + 12
+    if version == 0:
+        _, first_offset = struct.unpack_from('>II', data, position)
+        position += 8
+    else:
+        _, first_offset = struct.unpack_from('>QQ', data, position)
+        position += 16
+    reference_count = struct.unpack_from('>H', data, position + 2)[0]
+    position += 4
+
+    references = []
+    offset = box_end + first_offset
+    for _ in range(reference_count):
+        reference, duration, _ = struct.unpack_from('>III', data, position)
+        position += 12
+        size = reference & 0x7FFFFFFF
+        if not reference >> 31:
+            references.append(SidxReference(offset, size, duration / timescale))
+        offset += size
+    return references
+
+
+async def read_bytes(streamer: ByteStreamer, message_id: int, offset: int, length: int) -> bytes:
+    return b"".join([bytes(chunk) async for chunk in streamer.stream_file(message_id, offset, length)])
+
+
+async def build_index(streamer: ByteStreamer, file_info: Dict[str, Any]) -> Optional[Mp4Index]:
+    message_id, file_size = file_info['message_id'], file_info['file_size']
+    index = Mp4Index()
+    offset = 0
+    kept = 0
+
+    while offset + 8 <= file_size and len(index.boxes) < MAX_TOP_LEVEL_BOXES:
+        header = await read_bytes(streamer, message_id, offset, min(BOX_HEADER_SIZE, file_size - offset))
+        if len(header) < 8:
+            break
+        size, raw_type = struct.unpack_from('>I4s', header)
+        header_size = 8
+        if size == 1 and len(header) >= 16:
+            size = struct.unpack_from('>Q', header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - offset
+        if not raw_type.isalnum():
+            break
+        if size < header_size or offset + size > file_size:
+            break
+
+        box_type = raw_type.decode('latin-1')
+        index.boxes.append((box_type, offset, size))
+        if box_type in INDEX_BOXES and kept + size <= MAX_INDEX_BYTES:
+            data = await read_bytes(streamer, message_id, offset, size)
+            index.regions.append((offset, data))
+            kept += size
+            if box_type == 'sidx' and not index.references:
+                try:
+                    index.references = parse_sidx(data, offset + size)
+                except struct.error as e:
+                    logger.debug(f"Malformed sidx box in message {message_id}: {e}")
+        if box_type == 'moof':
+            break
+        offset += size
+
+    if not index.box('moov'):
+        return None
+    logger.debug(f"Indexed MP4 message {message_id}: {len(index.boxes)} boxes, {kept} bytes kept in memory")
+    return index
+
+
+async def _load_index(streamer: ByteStreamer, file_info: Dict[str, Any]) -> Union[Mp4Index, bool]:
+    work_loads[streamer.client_id] += 1
+    try:
+        index = await build_index(streamer, file_info)
+    except Exception as e:
+        logger.debug(f"Could not index MP4 message {file_info['message_id']}: {e}", exc_info=True)
+        mp4_indexes.set(file_info['unique_id'], False, ttl=FAILED_INDEX_TTL)
+        return False
+    finally:
+        work_loads[streamer.client_id] -= 1
+    mp4_indexes.set(file_info['unique_id'], index or False)
+    return index or False
+
+
+async def get_mp4_index(file_info: Dict[str, Any]) -> Optional[Mp4Index]:
+    if not is_mp4(file_info):
+        return None
+    index = mp4_indexes.get(file_info['unique_id'])
+    if index is None:
+        client_id = load_balancer.select(MAX_CONCURRENT_PER_CLIENT)
+        if client_id is None:
+            return None
+        index = await index_flight.do(file_info['unique_id'], _load_index, get_streamer(client_id), file_info)
+    return index or None
+
+
+def cached_mp4_index(file_info: Dict[str, Any]) -> Optional[Mp4Index]:
+    if not is_mp4(file_info):
+        return None
+    index = mp4_indexes.get(file_info['unique_id'])
+    if index is None:
+        task = asyncio.ensure_future(get_mp4_index(file_info))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+    return index or None
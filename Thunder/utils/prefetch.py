@@ -0,0 +1,155 @@
+# Thunder/utils/prefetch.py
+
+import asyncio
+import math
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from pyrogram.types import Message
+
+from Thunder.bot import work_loads
+from Thunder.utils.cache import TTLCache
+from Thunder.utils.custom_dl import (CHUNK_SIZE, FAILOVER_ERRORS, ByteStreamer,
+                                     disk_cache, file_info_cache, get_streamer)
+from Thunder.utils.file_properties import get_file_details
+from Thunder.utils.load_balancer import (MAX_CONCURRENT_PER_CLIENT,
+                                         load_balancer)
+from Thunder.utils.logger import logger
+from Thunder.vars import Var
+
+POPULARITY_TTL = 3600
+MAX_TRACKED_FILES = 1024
+MAX_BACKGROUND_FILLS = 2
+IDLE_RETRY_DELAY = 1.0
+IDLE_WAIT_TIMEOUT = 30.0
+WARM_UP_MEDIA = ('video', 'audio')
+
+
+class Prefetcher:
+    __slots__ = ('threshold', 'warm_up_size', '_viewers', '_filling', '_tasks', '_slots',
+                 'fills', 'warm_ups', 'chunks_filled', 'failures', 'abandoned')
+
+    def __init__(self, threshold: int, warm_up_size: int) -> None:
+        self.threshold = max(0, threshold)
+        self.warm_up_size = max(0, warm_up_size)
+        self._viewers = TTLCache(MAX_TRACKED_FILES, POPULARITY_TTL)
+        self._filling: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._slots = asyncio.Semaphore(MAX_BACKGROUND_FILLS)
+        self.fills = 0
+        self.warm_ups = 0
+        self.chunks_filled = 0
+        self.failures = 0
+        self.abandoned = 0
+
+    @property
+    def enabled(self) -> bool:
+        return disk_cache.enabled
+
+    def record_view(self, file_info: Dict[str, Any], viewer: str) -> None:
+        if not self.enabled or not self.threshold:
+            return
+        unique_id = file_info['unique_id']
+        viewers = self._viewers.get(unique_id)
+        if viewers is None:
+            viewers = set()
+            self._viewers.set(unique_id, viewers)
+        viewers.add(viewer)
+        if len(viewers) >= self.threshold:
+            self.fill(file_info)
+
+    def fill(self, file_info: Dict[str, Any], indexes: Optional[Iterable[int]] = None) -> None:
+        unique_id = file_info['unique_id']
+        if not self.enabled or unique_id in self._filling:
+            return
+        if file_info['file_size'] > disk_cache.max_bytes // 2:
+            return
+        chunk_count = math.ceil(file_info['file_size'] / CHUNK_SIZE)
+        missing = set(disk_cache.missing(unique_id, chunk_count))
+        if indexes is not None:
+            missing &= set(indexes)
+        if missing:
+            self.fills += 1
+            self._schedule(file_info, sorted(missing), keep_in_memory=False)
+
+    def warm_up(self, message: Message) -> None:
+        if not self.warm_up_size:
+            return
+        details = get_file_details(message)
+        if "error" in details or not details['file_size']:
+            return
+        mime_type = details.get('mime_type') or ''
+        if details['media_type'] not in WARM_UP_MEDIA and not mime_type.startswith(WARM_UP_MEDIA):
+            return
+        file_info = ByteStreamer.build_file_info(details)
+        if not file_info.get('file_id') or file_info['unique_id'] in self._filling:
+            return
+
+        file_info_cache.set(message.id, file_info)
+        file_size = file_info['file_size']
+        chunk_count = math.ceil(file_size / CHUNK_SIZE)
+        head = math.ceil(min(self.warm_up_size, file_size) / CHUNK_SIZE)
+        tail = max(0, file_size - self.warm_up_size) // CHUNK_SIZE
+        indexes = set(range(head)) | set(range(tail, chunk_count))
+        self.warm_ups += 1
+        self._schedule(file_info, sorted(indexes), keep_in_memory=True)
+
+    def _schedule(self, file_info: Dict[str, Any], indexes: List[int], keep_in_memory: bool) -> None:
+        unique_id = file_info['unique_id']
+        self._filling.add(unique_id)
+        task = asyncio.ensure_future(self._fill(file_info, indexes, keep_in_memory))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _: self._filling.discard(unique_id))
+
+    @staticmethod
+    async def _idle_client() -> Optional[int]:
+        deadline = asyncio.get_running_loop().time() + IDLE_WAIT_TIMEOUT
+        while True:
+            client_id = load_balancer.select(MAX_CONCURRENT_PER_CLIENT)
+            if client_id is not None and not load_balancer.is_throttled(client_id) \
+                    and work_loads[client_id] < MAX_CONCURRENT_PER_CLIENT // 2:
+                return client_id
+            if asyncio.get_running_loop().time() >= deadline:
+                return None
+            await asyncio.sleep(IDLE_RETRY_DELAY)
+
+    async def _fill(self, file_info: Dict[str, Any], indexes: List[int], keep_in_memory: bool) -> None:
+        async with self._slots:
+            logger.debug(f"Background fill of {file_info['unique_id']}: {len(indexes)} chunks")
+            for index in indexes:
+                client_id = await self._idle_client()
+                if client_id is None:
+                    self.abandoned += 1
+                    logger.debug(f"Background fill of {file_info['unique_id']} dropped at chunk {index}: no idle client")
+                    return
+                work_loads[client_id] += 1
+                try:
+                    await get_streamer(client_id).fill_chunk(file_info, index, keep_in_memory)
+                    self.chunks_filled += 1
+                except FAILOVER_ERRORS as e:
+                    self.failures += 1
+                    logger.debug(f"Background fill of {file_info['unique_id']} paused at chunk {index}: {e}")
+                    return
+                except Exception as e:
+                    self.failures += 1
+                    logger.error(f"Background fill of {file_info['unique_id']} failed at chunk {index}: {e}")
+                    return
+                finally:
+                    work_loads[client_id] -= 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled and bool(self.threshold),
+            "threshold": self.threshold,
+            "tracked_files": len(self._viewers),
+            "filling": len(self._filling),
+            "fills": self.fills,
+            "warm_up_size": self.warm_up_size,
+            "warm_ups": self.warm_ups,
+            "chunks_filled": self.chunks_filled,
+            "failures": self.failures,
+            "abandoned": self.abandoned
+        }
+
+
+prefetcher = Prefetcher(Var.PREFETCH_THRESHOLD, Var.WARM_UP_SIZE * CHUNK_SIZE)
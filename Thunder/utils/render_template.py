@@ -1,17 +1,26 @@
 # Thunder/utils/render_template.py
 
+import gzip
 import html as html_module
 import urllib.parse
+from typing import Optional
 
 from jinja2 import Environment, FileSystemLoader
 
 from Thunder.bot import StreamBot
 from Thunder.server.exceptions import InvalidHash
-from Thunder.utils.file_properties import get_fname, get_uniqid
-from Thunder.utils.handler import handle_flood_wait
+from Thunder.utils.cache import TTLCache
+from Thunder.utils.custom_dl import ByteStreamer, get_streamer
+from Thunder.utils.load_balancer import (MAX_CONCURRENT_PER_CLIENT,
+                                         load_balancer)
 from Thunder.utils.logger import logger
 from Thunder.vars import Var
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 template_env = Environment(
     loader=FileSystemLoader('Thunder/template'),
     enable_async=True,
@@ -20,14 +29,39 @@ template_env = Environment(
     optimized=True
 )
 
+page_cache = TTLCache(Var.PAGE_CACHE_SIZE, Var.CACHE_TTL)
+
+
+class RenderedPage:
+    __slots__ = ('secure_hash', 'html', 'gzip', 'br')
+
+    def __init__(self, secure_hash: str, html: str) -> None:
+        self.secure_hash = secure_hash
+        self.html = html.encode('utf-8')
+        self.gzip = gzip.compress(self.html, compresslevel=9)
+        self.br: Optional[bytes] = brotli.compress(self.html) if brotli else None
+
+
+def select_page_streamer() -> ByteStreamer:
+    client_id = load_balancer.select(MAX_CONCURRENT_PER_CLIENT)
+    return get_streamer(client_id) if client_id is not None else ByteStreamer(StreamBot)
+
+async def get_rendered_page(id: int, secure_hash: str, requested_action: str | None = None) -> RenderedPage:
+    template_name = 'req.html' if requested_action == 'stream' else 'dl.html'
+    key = (id, template_name)
+    page = page_cache.get(key)
+    if page is None:
+        page = RenderedPage(secure_hash, await render_page(id, secure_hash, requested_action))
+        page_cache.set(key, page)
+    elif page.secure_hash != secure_hash:
+        raise InvalidHash("File unique ID or secure hash mismatch during rendering.")
+    return page
+
 async def render_page(id: int, secure_hash: str, requested_action: str | None = None) -> str:
     try:
-        message = await handle_flood_wait(StreamBot.get_messages, chat_id=int(Var.BIN_CHANNEL), message_ids=id)
-        if not message:
-            raise InvalidHash("Message not found")
-        
-        file_unique_id = get_uniqid(message)
-        file_name = get_fname(message)
+        file_info = await select_page_streamer().get_file_properties(id)
+        file_unique_id = file_info.get('unique_id')
+        file_name = file_info.get('file_name') or f"file_{id}"
         
         if not file_unique_id or file_unique_id[:6] != secure_hash:
             raise InvalidHash("File unique ID or secure hash mismatch during rendering.")
@@ -40,7 +74,8 @@ async def render_page(id: int, secure_hash: str, requested_action: str | None =
             context = {
                 'heading': f"View {safe_filename}",
                 'file_name': safe_filename,
-                'src': src
+                'src': src,
+                'poster': urllib.parse.urljoin(Var.URL, f'thumb/{secure_hash}{id}') if file_info.get('thumb_id') else ''
             }
         else:
             template = template_env.get_template('dl.html')
@@ -0,0 +1,57 @@
+# Thunder/utils/thumbnails.py
+
+from typing import Any, Dict, Optional
+
+from pyrogram.errors import FloodWait
+
+from Thunder.utils.cache import ChunkCache
+from Thunder.utils.custom_dl import ByteStreamer
+from Thunder.utils.load_balancer import load_balancer
+from Thunder.utils.logger import logger
+from Thunder.utils.singleflight import SingleFlight
+from Thunder.vars import Var
+
+MAX_THUMB_SIZE = 512 * 1024
+
+thumb_cache = ChunkCache(Var.THUMB_CACHE_SIZE * 1024 * 1024)
+thumb_flight = SingleFlight()
+
+
+def thumb_mime_type(data: bytes) -> str:
+    if data.startswith(b'\x89PNG'):
+        return 'image/png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/jpeg'
+
+
+async def _download_thumb(streamer: ByteStreamer, thumb_id: str) -> Optional[bytes]:
+    try:
+        result = await streamer.client.download_media(thumb_id, in_memory=True)
+    except FloodWait as e:
+        load_balancer.record_flood_wait(streamer.client_id, e.value)
+        raise
+    data = result.getvalue() if result else b""
+    if not data or len(data) > MAX_THUMB_SIZE:
+        return None
+    return data
+
+
+async def _fetch_thumb(streamer: ByteStreamer, file_info: Dict[str, Any]) -> Optional[bytes]:
+    thumb_id = await streamer.get_thumb_id(file_info)
+    if not thumb_id:
+        return None
+    return await _download_thumb(streamer, thumb_id)
+
+
+async def get_thumbnail(streamer: ByteStreamer, file_info: Dict[str, Any]) -> Optional[bytes]:
+    if not file_info.get('thumb_id'):
+        return None
+    unique_id = file_info['unique_id']
+    data = thumb_cache.get(unique_id)
+    if data is None:
+        data = await thumb_flight.do(unique_id, _fetch_thumb, streamer, file_info)
+        if data:
+            thumb_cache.put(unique_id, data)
+            logger.debug(f"Cached thumbnail for message {file_info['message_id']} ({len(data)} bytes)")
+    return data
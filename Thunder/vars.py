@@ -42,6 +42,33 @@ class Var:
     PING_INTERVAL: int = int(os.getenv("PING_INTERVAL", "840"))
     NO_PORT: bool = str_to_bool(os.getenv("NO_PORT", "True"))
     CACHE_SIZE: int = int(os.getenv("CACHE_SIZE", "100"))
+    CACHE_TTL: int = int(os.getenv("CACHE_TTL", "3600"))
+    GET_MESSAGES_BATCH_MS: int = int(os.getenv("GET_MESSAGES_BATCH_MS", "5"))
+    CHUNK_CACHE_SIZE: int = int(os.getenv("CHUNK_CACHE_SIZE", "128"))
+    MP4_INDEX_CACHE_SIZE: int = int(os.getenv("MP4_INDEX_CACHE_SIZE", "64"))
+    DISK_CACHE_DIR: str = os.getenv("DISK_CACHE_DIR", "cache")
+    DISK_CACHE_SIZE: int = int(os.getenv("DISK_CACHE_SIZE", "0"))
+    STREAM_READAHEAD: int = int(os.getenv("STREAM_READAHEAD", "4"))
+    STRIPE_CLIENTS: int = int(os.getenv("STRIPE_CLIENTS", "1"))
+    STRIPE_MIN_SIZE: int = int(os.getenv("STRIPE_MIN_SIZE", "16"))
+    ADMISSION_QUEUE_SIZE: int = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+    ADMISSION_TIMEOUT: int = int(os.getenv("ADMISSION_TIMEOUT", "10"))
+    STREAM_WRITE_BUFFER: int = int(os.getenv("STREAM_WRITE_BUFFER", "1024"))
+    SOCKET_SEND_BUFFER: int = int(os.getenv("SOCKET_SEND_BUFFER", "0"))
+    MAX_STREAMS_PER_IP: int = int(os.getenv("MAX_STREAMS_PER_IP", "0"))
+    MAX_STREAMS_PER_LINK: int = int(os.getenv("MAX_STREAMS_PER_LINK", "0"))
+    RATE_LIMIT_PER_IP: int = int(os.getenv("RATE_LIMIT_PER_IP", "0"))
+    RATE_LIMIT_PER_LINK: int = int(os.getenv("RATE_LIMIT_PER_LINK", "0"))
+    SHAPING_QUEUE_SIZE: int = int(os.getenv("SHAPING_QUEUE_SIZE", "8"))
+    SHAPING_TIMEOUT: int = int(os.getenv("SHAPING_TIMEOUT", "10"))
+    TRUSTED_PROXY_HOPS: int = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+    PREFETCH_THRESHOLD: int = int(os.getenv("PREFETCH_THRESHOLD", "3"))
+    WARM_UP_SIZE: int = int(os.getenv("WARM_UP_SIZE", "0"))
+    THUMB_CACHE_SIZE: int = int(os.getenv("THUMB_CACHE_SIZE", "16"))
+    PAGE_CACHE_SIZE: int = int(os.getenv("PAGE_CACHE_SIZE", "256"))
+    REQUEST_TIMING: bool = str_to_bool(os.getenv("REQUEST_TIMING", "False"))
+    SLOW_REQUEST_MS: int = int(os.getenv("SLOW_REQUEST_MS", "2000"))
+    SLOW_REQUEST_SAMPLE_RATE: float = float(os.getenv("SLOW_REQUEST_SAMPLE_RATE", "1.0"))
 
     OWNER_ID: int = int(os.getenv("OWNER_ID", ""))
 